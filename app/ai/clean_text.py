@@ -4,8 +4,18 @@ class CleanText:
     def __init__(self, llm: OpenAIClient | None = None):
         self.llm = llm or OpenAIClient()
         
-    def clean(self, text: str) -> str:
+    async def clean(self, text: str) -> str:
         prompt_template = load_prompt("summarize.prompt")
         prompt = prompt_template.replace("{{SEARCH_TEXT}}", text)
         
-        return self.llm.tools(prompt)
\ No newline at end of file
+        return await self.llm.tools(prompt)
+
+    async def summarize_history(self, previous_summary: str, messages_text: str, max_tokens: int = 400) -> str:
+        prompt_template = load_prompt("summarize_history.prompt")
+        prompt = (
+            prompt_template
+            .replace("{{previous_summary}}", previous_summary or "-")
+            .replace("{{messages}}", messages_text)
+        )
+
+        return await self.llm.tools_with_limits(prompt, max_completion_tokens=max_tokens)
@@ -1,17 +1,19 @@
 import json
 import os
 import hashlib
-from typing import Dict, List
+from typing import Dict, List, Optional
 from app.ai.llm.client import OpenAIClient
 from app.ai.prompts.loader import load_prompt
 from app.services.search.cache import TTLCache
+from app.services.search.singleflight import SingleFlight
 
 
 class DecisionService:
     def __init__(self, llm: OpenAIClient | None = None):
         self.llm = llm or OpenAIClient()
         decision_cache_ttl = int(os.getenv("DECISION_CACHE_TTL_S", "300"))
-        self._decision_cache = TTLCache(ttl=decision_cache_ttl) if decision_cache_ttl > 0 else None
+        self._decision_cache = TTLCache(ttl=decision_cache_ttl, namespace="decision") if decision_cache_ttl > 0 else None
+        self._inflight = SingleFlight("decision")
         self.fast_response_keywords = [
             "halo", "hai", "hi", "hello", "hey",
             "pagi", "siang", "sore", "malam",
@@ -39,7 +41,7 @@ class DecisionService:
 
         return any(k in msg for k in self.fast_response_keywords)
 
-    def _generate_fast_response(self, user_message: str) -> str:
+    async def _generate_fast_response(self, user_message: str) -> str:
         
         tmpl = load_prompt("fast_response.prompt")
         prompt = (
@@ -51,9 +53,9 @@ class DecisionService:
                 "(Mode: fast-response) Jawab singkat, ramah, dan langsung membantu. ",
             )
         )
-        return (self.llm.generate(prompt) or "").strip()
+        return (await self.llm.generate(prompt) or "").strip()
 
-    def _generate_fast_response_with_history(self, user_message: str, user_history: str) -> str:
+    async def _generate_fast_response_with_history(self, user_message: str, user_history: str) -> str:
         tmpl = load_prompt("fast_response.prompt")
         history_text = (user_history or "").strip()
         if history_text:
@@ -67,13 +69,13 @@ class DecisionService:
             .replace("{{context_text}}", "")
             .replace("{{user_history}}", history_text)
         )
-        return (self.llm.generate(prompt) or "").strip()
+        return (await self.llm.generate(prompt) or "").strip()
 
     def _need_search_fast(self, message: str) -> bool:
         msg = message.lower()
         return any(k in msg for k in self.search_keywords)
 
-    def _generate_queries(self, user_message: str, user_history: str = "") -> List[str]:
+    async def _generate_queries(self, user_message: str, user_history: str = "") -> List[str]:
         prompt_template = load_prompt("search_query.prompt")
         prompt = (
             prompt_template
@@ -86,7 +88,7 @@ class DecisionService:
         except Exception:
             max_tokens = 128
 
-        raw = self.llm.tools_with_limits(
+        raw = await self.llm.tools_with_limits(
             prompt,
             max_completion_tokens=max(64, max_tokens),
             response_format={"type": "json_object"},
@@ -107,21 +109,35 @@ class DecisionService:
             if isinstance(q, str) and len(q.strip()) >= 3
         ]
 
-    def run(self, user_message: str, user_history: str = "") -> Dict:
+    def _cache_key(self, user_message: str, user_history: str) -> str:
+        cache_input = (user_message or "").lower().strip() + "\n" + (user_history or "").lower().strip()
+        return hashlib.sha256(cache_input.encode("utf-8")).hexdigest()
+
+    async def cached(self, user_message: str, user_history: str = "") -> Optional[Dict]:
+        if self._decision_cache is None:
+            return None
+        return await self._decision_cache.aget(self._cache_key(user_message, user_history)) or None
+
+    async def run(self, user_message: str, user_history: str = "") -> Dict:
         
+        cache_key = self._cache_key(user_message, user_history)
         if self._decision_cache is not None:
-            cache_input = (user_message or "").lower().strip() + "\n" + (user_history or "").lower().strip()
-            cache_key = hashlib.sha256(cache_input.encode("utf-8")).hexdigest()
-            cached = self._decision_cache.get(cache_key)
+            cached = await self._decision_cache.aget(cache_key)
             if cached:
                 return cached
-        
+
+        return await self._inflight.do(
+            cache_key,
+            lambda: self._decide(user_message, user_history, cache_key),
+        )
+
+    async def _decide(self, user_message: str, user_history: str, cache_key: str) -> Dict:
         is_fast = self._is_fast_response(user_message)
         needs_search = self._need_search_fast(user_message)
         
         
         if is_fast and needs_search:
-            queries = self._generate_queries(user_message, user_history=user_history)
+            queries = await self._generate_queries(user_message, user_history=user_history)
             result = {
                 "need_search": True,
                 "fast_response": True,
@@ -136,7 +152,7 @@ class DecisionService:
         
         
         if is_fast and not needs_search:
-            fast = self._generate_fast_response_with_history(user_message, user_history=user_history)
+            fast = await self._generate_fast_response_with_history(user_message, user_history=user_history)
             result = {
                 "need_search": False,
                 "fast_response": True,
@@ -164,7 +180,7 @@ class DecisionService:
             return result
 
         
-        queries = self._generate_queries(user_message, user_history=user_history)
+        queries = await self._generate_queries(user_message, user_history=user_history)
 
         result = {
             "need_search": True,
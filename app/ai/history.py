@@ -0,0 +1,195 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from app.ai.tokens import count_tokens, trim_tail_to_tokens, trim_to_tokens
+
+
+HEADER = "[CHAT_HISTORY_START] (oldest -> newest)\n"
+FOOTER = "[CHAT_HISTORY_END]\n"
+OMITTED = "--- (older messages omitted due to ORCH_MAX_HISTORY_CHARS) ---\n"
+
+_MARKER_RE = re.compile(r"^--- message \d+/\d+ ---$", re.M)
+
+
+def _body(msg: Optional[Dict[str, str]]) -> str:
+    role = (msg or {}).get("role", "user")
+    content = ((msg or {}).get("content", "") or "").strip()
+    return f"role: {role}\ncontent:\n{content}\n"
+
+
+def _marker(index: int, n: int) -> str:
+    return f"--- message {index}/{n} ---\n"
+
+
+def message_fingerprint(msg: Optional[Dict[str, str]]) -> bytes:
+    role = str((msg or {}).get("role", "user"))
+    content = str((msg or {}).get("content", "") or "")
+    return hashlib.blake2b(f"{role}\0{content}".encode("utf-8", errors="ignore"), digest_size=16).digest()
+
+
+def _render(window, n: int) -> str:
+    parts = [_marker(index, n) + body for index, body in window]
+    if not window or window[0][0] > 1:
+        parts.insert(0, OMITTED)
+    return HEADER + "".join(parts) + FOOTER
+
+
+def _window(chat_history: List[Dict[str, str]], max_chars: int, start: int = 0) -> deque:
+    # Newest messages after `start` whose formatted size fits, stopping at the first that does not.
+    n = len(chat_history)
+    window: deque = deque()
+    total = len(HEADER) + len(FOOTER)
+    for index in range(n, start, -1):
+        body = _body(chat_history[index - 1])
+        size = len(_marker(index, n)) + len(body)
+        if total + size > max_chars:
+            break
+        window.appendleft((index, body))
+        total += size
+    return window
+
+
+def format_history(chat_history: Optional[List[Dict[str, str]]], max_chars: int) -> str:
+    if not chat_history:
+        return ""
+    return _render(_window(chat_history, max_chars), len(chat_history))
+
+
+def trim_history(history_text: str, max_tokens: int) -> str:
+    # Drops whole oldest messages until the history fits; anything before the
+    # history block (a conversation summary) is kept and trimmed last.
+    if not history_text or count_tokens(history_text) <= max_tokens:
+        return history_text
+
+    start = history_text.find(HEADER)
+    if start < 0:
+        return trim_tail_to_tokens(history_text, max_tokens)
+
+    prefix = history_text[:start]
+    body = history_text[start + len(HEADER):]
+    prefix_tokens = count_tokens(prefix)
+    if prefix_tokens >= max_tokens:
+        return trim_to_tokens(prefix, max_tokens)
+
+    def candidate(offset: int) -> str:
+        return prefix + HEADER + OMITTED + body[offset:]
+
+    # The newest messages are kept, so search for the earliest marker that still fits.
+    positions = [m.start() for m in _MARKER_RE.finditer(body)]
+    lo, hi = 0, len(positions)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if count_tokens(candidate(positions[mid])) <= max_tokens:
+            hi = mid
+        else:
+            lo = mid + 1
+    if lo < len(positions):
+        return candidate(positions[lo])
+    return prefix + HEADER + OMITTED + FOOTER
+
+
+class _Window:
+    # The formatted window as segments around each message's "/{n}" slot, so a new
+    # total only costs one str.join and appending or dropping a message touches
+    # only the ends:  head_1 | tail_1 + head_2 | ... | tail_k
+    def __init__(self):
+        self.entries: deque = deque()
+        self.segments: deque = deque([""])
+        self.fixed = len(HEADER) + len(FOOTER)
+        self.count = 0
+        self.start = 0
+        self.snapshot: list = []
+
+    def size(self, n: int) -> int:
+        return self.fixed + len(self.entries) * len(str(n))
+
+    def append(self, index: int, body: str) -> None:
+        head = f"--- message {index}/"
+        tail = f" ---\n{body}"
+        self.entries.append((index, len(head) + len(tail)))
+        self.segments[-1] += head
+        self.segments.append(tail)
+        self.fixed += len(head) + len(tail)
+
+    def popleft(self) -> None:
+        _, size = self.entries.popleft()
+        self.fixed -= size
+        self.segments.popleft()
+        if self.entries:
+            self.segments[0] = f"--- message {self.entries[0][0]}/"
+        else:
+            self.segments[0] = ""
+
+    def render(self, n: int) -> str:
+        omitted = OMITTED if not self.entries or self.entries[0][0] > 1 else ""
+        return HEADER + omitted + str(n).join(self.segments) + FOOTER
+
+
+class IncrementalHistory:
+    # Per-session formatted window. A turn that only appends messages formats just
+    # the new ones; anything else falls back to a full format. Reuse requires every
+    # rendered message, and the one just before them, to be unchanged at the same
+    # position; that is all the output depends on, so it also holds for clients
+    # sending a sliding window of the last N messages. Output is identical to
+    # format_history.
+    def __init__(self, max_chars: int, max_sessions: int = 10000):
+        self.max_chars = max_chars
+        self.max_sessions = max(1, max_sessions)
+        self._sessions: "OrderedDict[str, _Window]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def format(self, session_id: str, chat_history: Optional[List[Dict[str, str]]]) -> str:
+        if not chat_history:
+            return ""
+
+        n = len(chat_history)
+        # Taken out while in use so concurrent turns of one session never share it.
+        with self._lock:
+            window = self._sessions.pop(session_id, None)
+
+        count = 0
+        if (
+            window is not None
+            and window.count <= n
+            and chat_history[window.start:window.count] == window.snapshot
+        ):
+            self.hits += 1
+            count = window.count
+        else:
+            self.misses += 1
+            window = None
+
+        new = _window(chat_history, self.max_chars, count)
+        if window is None or len(new) < n - count:
+            # No usable state, or the new messages alone overflow the budget.
+            window = _Window()
+        for index, body in new:
+            window.append(index, body)
+        while window.entries and window.size(n) > self.max_chars:
+            window.popleft()
+
+        # Copies of the rendered messages and the one before them, which is all
+        # the output depends on; the list comparison above runs in C and stays
+        # within max_chars of content.
+        first = window.entries[0][0] if window.entries else n
+        start = max(0, first - 2)
+        if window.count:
+            snapshot = window.snapshot[start - window.start:]
+            snapshot.extend(dict(m) if isinstance(m, dict) else m for m in chat_history[window.count:n])
+        else:
+            snapshot = [dict(m) if isinstance(m, dict) else m for m in chat_history[start:n]]
+        window.count = n
+        window.start = start
+        window.snapshot = snapshot
+        text = window.render(n)
+
+        with self._lock:
+            self._sessions[session_id] = window
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return text
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Dict, List
+
+from app.ai.clean_text import CleanText
+from app.ai.history import format_history, message_fingerprint
+from app.services.search.cache import TTLCache
+
+
+SUMMARY_HEADER = "[CONVERSATION_SUMMARY] (older messages)\n"
+SUMMARY_FOOTER = "[CONVERSATION_SUMMARY_END]\n"
+
+
+class RollingSummary:
+    # Older turns of a session are folded into a running summary by a background
+    # task. Requests only read the latest summary and never wait on the LLM; until
+    # the first summary lands they fall back to the raw (truncated) history.
+    def __init__(
+        self,
+        cleantext: CleanText,
+        trigger_messages: int = 24,
+        keep_messages: int = 8,
+        max_input_chars: int = 12000,
+        max_tokens: int = 400,
+        ttl: int = 60 * 60 * 24,
+    ):
+        self.cleantext = cleantext
+        self.keep_messages = max(1, keep_messages)
+        self.trigger_messages = max(self.keep_messages + 1, trigger_messages)
+        self.max_input_chars = max_input_chars
+        self.max_tokens = max_tokens
+        self._state = TTLCache(ttl=ttl, namespace="orch:history_summary")
+        self._running: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    def _locate(self, state: dict, chat_history: List[Dict[str, str]]) -> int:
+        # The summary covers messages up to a boundary message; a session store that
+        # dropped older messages shifts its index, so search back for it.
+        fingerprint = bytes.fromhex(state["fingerprint"])
+        for index in range(min(state["upto"], len(chat_history)), 0, -1):
+            if message_fingerprint(chat_history[index - 1]) == fingerprint:
+                return index
+        return 0
+
+    async def prepare(self, session_id: str, chat_history: List[Dict[str, str]]) -> tuple[str, int]:
+        state = await self._state.aget(session_id)
+        summary, upto = "", 0
+        if state:
+            upto = self._locate(state, chat_history)
+            summary = state["summary"] if upto else ""
+
+        if len(chat_history) - upto >= self.trigger_messages:
+            self._schedule(session_id, chat_history, summary, upto)
+        return summary, upto
+
+    def _schedule(self, session_id: str, chat_history: List[Dict[str, str]], summary: str, upto: int) -> None:
+        if session_id in self._running:
+            return
+        target = len(chat_history) - self.keep_messages
+        span = list(chat_history[upto:target])
+        fingerprint = message_fingerprint(chat_history[target - 1]).hex()
+
+        self._running.add(session_id)
+        task = asyncio.create_task(self._summarize(session_id, summary, span, target, fingerprint))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, session_id: str, summary: str, span: list, target: int, fingerprint: str) -> None:
+        try:
+            messages_text = format_history(span, self.max_input_chars)
+            new_summary = await self.cleantext.summarize_history(summary, messages_text, self.max_tokens)
+            self._state.set(session_id, {"upto": target, "fingerprint": fingerprint, "summary": new_summary.strip()})
+        except Exception as e:
+            print(f"History summary failed for session {session_id}: {e}")
+        finally:
+            self._running.discard(session_id)
+
+    async def aclose(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def format(self, summary: str, recent_text: str) -> str:
+        return SUMMARY_HEADER + summary.strip() + "\n" + SUMMARY_FOOTER + recent_text
@@ -1,6 +1,9 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
 from app.ai.llm.root_prompts.loader import load_prompt
+from app.core.metrics import LLM_REQUESTS, LLM_TOKENS
+from typing import AsyncIterator
+import httpx
 import os
 
 load_dotenv()
@@ -29,9 +32,36 @@ class OpenAIClient:
 
         self._timeout_s = max(0.1, timeout_s)
         self._max_retries = max(0, max_retries)
+
+        try:
+            pool_max_connections = int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "200"))
+        except Exception:
+            pool_max_connections = 200
+
+        try:
+            pool_max_keepalive = int(os.getenv("OPENAI_POOL_MAX_KEEPALIVE", "50"))
+        except Exception:
+            pool_max_keepalive = 50
+
+        try:
+            keepalive_expiry_s = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_S", "30"))
+        except Exception:
+            keepalive_expiry_s = 30.0
+
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max(1, pool_max_connections),
+                max_keepalive_connections=max(0, pool_max_keepalive),
+                keepalive_expiry=max(0.0, keepalive_expiry_s),
+            ),
+        )
         
-        
-        self.client = OpenAI(api_key=api_key, timeout=self._timeout_s, max_retries=self._max_retries)
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=self._timeout_s,
+            max_retries=self._max_retries,
+            http_client=http_client,
+        )
         
         
         main_model = os.getenv("OPENAI_MAIN_MODEL", main_model)
@@ -74,9 +104,21 @@ class OpenAIClient:
             "temperature": tools_temperature,
         }
     
-    def generate(self, prompt: str) -> str:
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    def _record_usage(self, response, model: str, operation: str, request: bool = True) -> None:
+        if request:
+            LLM_REQUESTS.inc(model=model, operation=operation)
+        usage = getattr(response, "usage", None)
+        if not usage:
+            return
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, operation=operation, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, operation=operation, kind="completion")
+
+    async def generate(self, prompt: str) -> str:
         root_prompt = load_prompt("health.prompt")
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=self.main_model,
             messages=[
                 {"role": "system", "content": root_prompt},
@@ -84,6 +126,7 @@ class OpenAIClient:
             ],
             **self.main_config,
         )
+        self._record_usage(response, self.main_model, "generate")
         
         if not response or not response.choices:
             raise RuntimeError("Empty response from OpenAI")
@@ -93,7 +136,7 @@ class OpenAIClient:
             return content.strip()
 
         
-        retry = self.client.chat.completions.create(
+        retry = await self.client.chat.completions.create(
             model=self.fallback_model,
             messages=[
                 {"role": "system", "content": root_prompt},
@@ -101,18 +144,67 @@ class OpenAIClient:
             ],
             max_completion_tokens=self.main_config.get("max_completion_tokens", 768),
         )
+        self._record_usage(retry, self.fallback_model, "generate")
 
         if not retry or not retry.choices or not retry.choices[0].message.content:
             raise RuntimeError("Empty response from OpenAI")
 
         return retry.choices[0].message.content.strip()
     
-    def tools(self, prompt: str) -> str:
-        response = self.client.chat.completions.create(
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        root_prompt = load_prompt("health.prompt")
+        messages = [
+            {"role": "system", "content": root_prompt},
+            {"role": "user", "content": prompt},
+        ]
+        attempts = [
+            {"model": self.main_model, **self.main_config},
+            {
+                "model": self.fallback_model,
+                "max_completion_tokens": self.main_config.get("max_completion_tokens", 768),
+            },
+        ]
+
+        for config in attempts:
+            stream = await self.client.chat.completions.create(
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **config,
+            )
+            LLM_REQUESTS.inc(model=config["model"], operation="generate_stream")
+
+            emitted = False
+            async for chunk in stream:
+                if chunk and chunk.usage:
+                    self._record_usage(chunk, config["model"], "generate_stream", request=False)
+                if not chunk or not chunk.choices:
+                    continue
+
+                content = chunk.choices[0].delta.content
+                if not content:
+                    continue
+
+                if not emitted:
+                    content = content.lstrip()
+                    if not content:
+                        continue
+
+                emitted = True
+                yield content
+
+            if emitted:
+                return
+
+        raise RuntimeError("Empty response from OpenAI")
+    
+    async def tools(self, prompt: str) -> str:
+        response = await self.client.chat.completions.create(
             model=self.tools_model,
             messages=[{"role": "user", "content": prompt}],
             **self.tools_config,
         )
+        self._record_usage(response, self.tools_model, "tools")
             
         if not response or not response.choices:
             raise RuntimeError("Empty response from OpenAI")
@@ -121,19 +213,20 @@ class OpenAIClient:
         if content:
             return content.strip()        
         
-        retry = self.client.chat.completions.create(
+        retry = await self.client.chat.completions.create(
             model=self.main_model,
             messages=[{"role": "user", "content": prompt}],
             max_completion_tokens=self.tools_config.get("max_completion_tokens", 2048),
             temperature=0,
         )
+        self._record_usage(retry, self.main_model, "tools")
 
         if not retry or not retry.choices or not retry.choices[0].message.content:
             raise RuntimeError(f"Empty content from OpenAI. Response: {response}")
 
         return retry.choices[0].message.content.strip()
 
-    def tools_with_limits(
+    async def tools_with_limits(
         self,
         prompt: str,
         *,
@@ -147,11 +240,12 @@ class OpenAIClient:
         if response_format is not None:
             config["response_format"] = response_format
 
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=self.tools_model,
             messages=[{"role": "user", "content": prompt}],
             **config,
         )
+        self._record_usage(response, self.tools_model, "tools_with_limits")
 
         if not response or not response.choices:
             raise RuntimeError("Empty response from OpenAI")
@@ -163,18 +257,56 @@ class OpenAIClient:
         
         retry_config = dict(config)
         retry_config["temperature"] = 0
-        retry = self.client.chat.completions.create(
+        retry = await self.client.chat.completions.create(
             model=self.main_model,
             messages=[{"role": "user", "content": prompt}],
             **retry_config,
         )
+        self._record_usage(retry, self.main_model, "tools_with_limits")
 
         if not retry or not retry.choices or not retry.choices[0].message.content:
             raise RuntimeError(f"Empty content from OpenAI. Response: {response}")
 
         return retry.choices[0].message.content.strip()
     
-    def image_scan(
+    def batch_request_body(
+        self,
+        prompt: str,
+        *,
+        max_completion_tokens: int,
+        response_format: dict | None = None,
+    ) -> dict:
+        body = {
+            "model": self.tools_model,
+            "messages": [{"role": "user", "content": prompt}],
+            **self.tools_config,
+            "max_completion_tokens": max_completion_tokens,
+            "temperature": 0,
+        }
+        if response_format is not None:
+            body["response_format"] = response_format
+        return body
+
+    async def submit_batch(self, requests_jsonl: str) -> str:
+        upload = await self.client.files.create(
+            file=("batch.jsonl", requests_jsonl.encode("utf-8")),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def retrieve_batch(self, batch_id: str):
+        return await self.client.batches.retrieve(batch_id)
+
+    async def download_file(self, file_id: str) -> str:
+        content = await self.client.files.content(file_id)
+        return content.text
+
+    async def image_scan(
         self,
         image_url: str,
         prompt: str = "Jelaskan isi gambar ini secara singkat dan faktual."
@@ -186,7 +318,7 @@ class OpenAIClient:
         except Exception:
             image_max_tokens = 256
 
-        response = self.client.chat.completions.create(
+        response = await self.client.chat.completions.create(
             model=image_model,
             messages=[
                 {
@@ -204,6 +336,7 @@ class OpenAIClient:
             temperature=0,
             response_format={"type": "json_object"},
         )
+        self._record_usage(response, image_model, "image_scan")
 
         if not response or not response.choices:
             raise RuntimeError("Empty response from OpenAI (image_scan)")
@@ -2,43 +2,134 @@ from app.ai.decision import DecisionService
 from app.ai.llm.client import OpenAIClient
 from app.services.search.search_service import search_and_extract
 from app.ai.prompts.loader import load_prompt
-# from app.ai.clean_text import CleanText
-from typing import List, Dict, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.ai.clean_text import CleanText
+from typing import List, Dict, AsyncIterator, Optional
+import asyncio
 import os
 import time
 import hashlib
 import json
 
 
+from app.ai.history import IncrementalHistory, format_history, trim_history
+from app.ai.history_summary import RollingSummary
+from app.ai.semantic_cache import SemanticCache
+from app.ai.tokens import clip_to_sentence, count_tokens, trim_to_tokens
+from app.core.metrics import observe_stages
+from app.services.image.fetcher import fetch_image, to_data_url
+from app.services.session.session_store import create_session_store
+from app.services.image.phash import PerceptualCache, dhash
 from app.services.search.cache import TTLCache
+from app.services.search.dedup import hamming, simhash
+from app.services.search.singleflight import SingleFlight
 
 class Orchestrator:
     def __init__(self):
         self.llm = OpenAIClient()
         self.decision = DecisionService(llm=self.llm)
-        # self.cleantext = CleanText(llm=self.llm)
-        self._profile = os.getenv("PROFILE_LATENCY", "0") == "1"
+        self.cleantext = CleanText(llm=self.llm)
         try:
-            self._debug = int(os.getenv("ORCH_DEBUG", "1"))
+            self._debug = int(os.getenv("ORCH_DEBUG", "0"))
         except Exception:
             self._debug = 0
         self._max_search_queries = int(os.getenv("MAX_SEARCH_QUERIES", "2"))
+        self._speculative_search = os.getenv("ORCH_SPECULATIVE_SEARCH", "0") == "1"
+        self._speculative_budget_s = float(os.getenv("ORCH_SPECULATIVE_BUDGET_S", "3"))
+        self._speculative_grace_s = float(os.getenv("ORCH_SPECULATIVE_GRACE_S", "0.3"))
 
-        self._max_context_chars = int(os.getenv("ORCH_MAX_CONTEXT_CHARS", "8000"))
         self._max_history_chars = int(os.getenv("ORCH_MAX_HISTORY_CHARS", "4000"))
         self._max_source_chars = int(os.getenv("ORCH_MAX_SOURCE_CHARS", "1800"))
+        # Token budget for the whole answer prompt; the template and the question are
+        # always kept, history gets up to its share and sources take the rest.
+        self._prompt_max_tokens = int(os.getenv("ORCH_PROMPT_MAX_TOKENS", "6000"))
+        self._source_max_tokens = int(os.getenv("ORCH_SOURCE_MAX_TOKENS", "600"))
+        self._history_share = float(os.getenv("ORCH_HISTORY_SHARE", "0.25"))
+        self._source_dedup_distance = int(os.getenv("ORCH_SOURCE_DEDUP_MAX_DISTANCE", "3"))
+        self.sessions = create_session_store()
+        self._history = IncrementalHistory(
+            self._max_history_chars,
+            max_sessions=int(os.getenv("ORCH_HISTORY_CACHE_SESSIONS", "10000")),
+        )
+        # Opt-in: sessions past the trigger get older turns replaced by a background summary.
+        self._summary = None
+        if os.getenv("ORCH_HISTORY_SUMMARY", "0") == "1":
+            self._summary = RollingSummary(
+                self.cleantext,
+                trigger_messages=int(os.getenv("ORCH_HISTORY_SUMMARY_TRIGGER_MESSAGES", "24")),
+                keep_messages=int(os.getenv("ORCH_HISTORY_SUMMARY_KEEP_MESSAGES", "8")),
+                max_input_chars=int(os.getenv("ORCH_HISTORY_SUMMARY_MAX_INPUT_CHARS", "12000")),
+                max_tokens=int(os.getenv("ORCH_HISTORY_SUMMARY_MAX_TOKENS", "400")),
+            )
 
         llm_cache_ttl = int(os.getenv("ORCH_LLM_CACHE_TTL_S", "0"))
-        self._llm_cache = TTLCache(ttl=max(1, llm_cache_ttl)) if llm_cache_ttl > 0 else None
+        self._llm_cache = TTLCache(ttl=max(1, llm_cache_ttl), namespace="orch:llm") if llm_cache_ttl > 0 else None
+        self._llm_inflight = SingleFlight("orch:llm")
+
+        # Opt-in: near-identical first-turn questions reuse a previous answer and its sources.
+        self._semantic_cache = None
+        if os.getenv("ORCH_SEMANTIC_CACHE", "0") == "1":
+            self._semantic_cache = SemanticCache(
+                threshold=float(os.getenv("ORCH_SEMANTIC_CACHE_THRESHOLD", "0.85")),
+                ttl=float(os.getenv("ORCH_SEMANTIC_CACHE_TTL_S", "3600")),
+                max_entries=int(os.getenv("ORCH_SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+            )
+        self._volatile_keywords = ["hari ini", "sekarang", "terbaru", "terkini", "update", "realtime", "real-time", "live"]
 
         image_cache_ttl = int(os.getenv("ORCH_IMAGE_CACHE_TTL_S", "1800"))
-        self._image_cache = TTLCache(ttl=max(1, image_cache_ttl)) if image_cache_ttl > 0 else None
+        self._image_cache = TTLCache(ttl=max(1, image_cache_ttl), namespace="orch:image") if image_cache_ttl > 0 else None
+
+        # Signed upload URLs change on every request, so scans are also keyed on what the image looks like.
+        self._image_hash_cache = None
+        if image_cache_ttl > 0 and os.getenv("ORCH_IMAGE_HASH_CACHE", "1") == "1":
+            self._image_hash_cache = PerceptualCache(
+                max_distance=int(os.getenv("ORCH_IMAGE_HASH_MAX_DISTANCE", "6")),
+                ttl=image_cache_ttl,
+                max_entries=int(os.getenv("ORCH_IMAGE_HASH_MAX_ENTRIES", "5000")),
+            )
+        self._image_inflight = SingleFlight("orch:image")
+        self._scan_batch_concurrency = max(1, int(os.getenv("ORCH_SCAN_BATCH_CONCURRENCY", "4")))
 
         user_insight_cache_ttl = int(os.getenv("ORCH_USER_INSIGHT_CACHE_TTL_S", "900"))
         self._user_insight_cache = (
-            TTLCache(ttl=max(1, user_insight_cache_ttl)) if user_insight_cache_ttl > 0 else None
+            TTLCache(ttl=max(1, user_insight_cache_ttl), namespace="orch:user_insight") if user_insight_cache_ttl > 0 else None
         )
+        self._user_insight_inflight = SingleFlight("orch:user_insight")
+        self._user_insight_max_tokens = int(os.getenv("USER_INSIGHT_MAX_TOKENS", "512"))
+        self._user_insight_batch_concurrency = max(1, int(os.getenv("ORCH_USER_INSIGHT_BATCH_CONCURRENCY", "8")))
+
+    async def aclose(self) -> None:
+        if self._summary is not None:
+            await self._summary.aclose()
+        await self.llm.aclose()
+        self.sessions.close()
+
+    async def _session_call(self, fn, *args):
+        if self.sessions.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _load_session(self, session_id: Optional[str], chat_history) -> tuple[object, bool]:
+        # Without an uploaded chat_history, a session_id selects the server-side conversation.
+        # A store outage answers without history and leaves the session untouched.
+        if not session_id or chat_history is not None:
+            return chat_history, False
+        try:
+            return await self._session_call(self.sessions.get, session_id), True
+        except Exception as e:
+            print(f"Session load failed for {session_id}, answering without history: {e}")
+            return [], False
+
+    async def _remember(self, session_id: str, user_message: str, answer: str) -> None:
+        messages = [{"role": "user", "content": user_message}]
+        if answer:
+            messages.append({"role": "assistant", "content": answer})
+        try:
+            await self._session_call(self.sessions.append, session_id, messages)
+        except Exception as e:
+            print(f"Session append failed for {session_id}: {e}")
+
+    async def clear_session(self, session_id: str) -> None:
+        await self._session_call(self.sessions.clear, session_id)
 
     def _truncate(self, text: str, max_chars: int) -> str:
         if not text or max_chars <= 0:
@@ -47,46 +138,58 @@ class Orchestrator:
             return text
         return text[-max_chars:]
 
-    def _format_history(self, chat_history: Optional[List[Dict[str, str]]]) -> str:
-        if not chat_history:
-            return ""
-
-        header = "[CHAT_HISTORY_START] (oldest -> newest)\n"
-        footer = "[CHAT_HISTORY_END]\n"
-        
-        parts_from_tail: list[str] = []
-        total = len(header) + len(footer)
-        truncated = False
-
-        n = len(chat_history)
-        for idx_from_end, msg in enumerate(reversed(chat_history), start=1):
-            original_index = n - idx_from_end + 1  # 1-based index in original list
-            role = (msg or {}).get("role", "user")
-            content = ((msg or {}).get("content", "") or "").strip()
-
-            entry = (
-                f"--- message {original_index}/{n} ---\n"
-                f"role: {role}\n"
-                f"content:\n{content}\n"
-            )
-
-            if total + len(entry) > self._max_history_chars:
-                truncated = True
-                break
-
-            parts_from_tail.append(entry)
-            total += len(entry)
-
-        parts = list(reversed(parts_from_tail))
-        if truncated:
-            parts.insert(0, "--- (older messages omitted due to ORCH_MAX_HISTORY_CHARS) ---\n")
+    def _format_history(self, chat_history: Optional[List[Dict[str, str]]], session_id: Optional[str] = None) -> str:
+        if session_id:
+            return self._history.format(session_id, chat_history)
+        return format_history(chat_history, self._max_history_chars)
 
-        return header + "".join(parts) + footer
-
-    def handle_chat(self, user_message: str, chat_history: Optional[List[Dict[str, str]]] = None) -> dict:
+    async def _history_text(self, chat_history, session_id: Optional[str] = None) -> str:
+        # Formatted once per request and shared by the decision and the answer prompt.
+        if isinstance(chat_history, list):
+            if self._summary is not None and session_id and chat_history:
+                summary, upto = await self._summary.prepare(session_id, chat_history)
+                if upto:
+                    recent_text = self._format_history(chat_history[upto:], f"{session_id}:{upto}")
+                    return self._summary.format(summary, recent_text)
+            return self._format_history(chat_history, session_id)
+        return self._truncate(chat_history or "", self._max_history_chars)
+
+    def _semantic_cacheable(self, user_message: str, chat_history) -> bool:
+        if self._semantic_cache is None or chat_history:
+            return False
+        msg = (user_message or "").lower()
+        return not any(k in msg for k in self._volatile_keywords)
+
+    def _semantic_hit(self, user_message: str, chat_history, t0: float) -> Optional[dict]:
+        if not self._semantic_cacheable(user_message, chat_history):
+            return None
+        cached = self._semantic_cache.get(user_message)
+        if not cached:
+            return None
+        timings = {"total_ms": round((time.perf_counter() - t0) * 1000, 1), "semantic_cache": True}
+        return {**cached, "timings": timings}
+
+    async def handle_chat(
+        self,
+        user_message: str,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        session_id: Optional[str] = None,
+    ) -> dict:
+        chat_history, stored = await self._load_session(session_id, chat_history)
+        result = await self._handle_chat(user_message, chat_history, session_id)
+        if stored:
+            await self._remember(session_id, user_message, result["answer"])
+        return result
+
+    async def _handle_chat(self, user_message: str, chat_history, session_id: Optional[str]) -> dict:
         t0 = time.perf_counter()
-        history_text = self._format_history(chat_history) if isinstance(chat_history, list) else (chat_history or "")
-        decision = self.decision.run(user_message, user_history=history_text)
+        hit = self._semantic_hit(user_message, chat_history, t0)
+        if hit is not None:
+            observe_stages("chat", hit["timings"])
+            return hit
+
+        history_text = await self._history_text(chat_history, session_id)
+        decision, speculative = await self._decide(user_message, history_text)
         t_decision = time.perf_counter()
 
         if self._debug:
@@ -94,198 +197,431 @@ class Orchestrator:
 
         
         if decision.get("fast_response") and not decision.get("need_search"):
+            if speculative is not None:
+                speculative.cancel()
+            timings = self._timings(t0, t_decision)
+            observe_stages("chat", timings)
             return {
                 "answer": (decision.get("fast_response_return") or "").strip(),
                 "sources": [],
                 "decision": decision,
+                "timings": timings,
             }
 
-        context_blocks = []
-        
-        if decision["need_search"]:
-            queries = decision.get("queries") or []
-            if self._max_search_queries > 0:
-                queries = queries[: self._max_search_queries]
-
-            with ThreadPoolExecutor(max_workers=min(5, max(1, len(queries)))) as executor:
-                future_to_query = {executor.submit(search_and_extract, query): query for query in queries}
-                for future in as_completed(future_to_query):
-                    try:
-                        search_result = future.result()
-                        context_blocks.append(search_result)
-                    except Exception as exc:
-                        print(f'Search generated an exception: {exc}')
+        context_blocks = await self._run_searches(decision, speculative)
 
         if self._debug:
             print(context_blocks)
 
         t_search = time.perf_counter()
 
-        prompt, sources = self._build_prompt(user_message, context_blocks, chat_history)
+        prompt, sources = self._build_prompt(user_message, context_blocks, history_text)
 
         if self._debug:
             print(prompt)
 
         t_prompt = time.perf_counter()
         
-        if self._llm_cache is not None:
-            key = hashlib.sha256(prompt.encode("utf-8", errors="ignore")).hexdigest()
-            cached = self._llm_cache.get(key)
-            if cached:
-                answer = cached
-            else:
-                answer = self.llm.generate(prompt)
-                self._llm_cache.set(key, answer)
+        key = hashlib.sha256(prompt.encode("utf-8", errors="ignore")).hexdigest()
+        cached = await self._llm_cache.aget(key) if self._llm_cache is not None else None
+        if cached:
+            answer = cached
         else:
-            answer = self.llm.generate(prompt)
+            answer = await self._llm_inflight.do(key, lambda: self._generate_answer(key, prompt))
         t_done = time.perf_counter()
 
-        if self._profile:
-            print(
-                "LATENCY(ms): "
-                f"decision={(t_decision - t0) * 1000:.0f} "
-                f"search={(t_search - t_decision) * 1000:.0f} "
-                f"prompt={(t_prompt - t_search) * 1000:.0f} "
-                f"llm={(t_done - t_prompt) * 1000:.0f} "
-                f"total={(t_done - t0) * 1000:.0f}"
-            )
-        
+        timings = self._timings(t0, t_decision, t_search, t_prompt, t_done, speculative=speculative is not None)
+        observe_stages("chat", timings)
+
+        if answer and self._semantic_cacheable(user_message, chat_history):
+            self._semantic_cache.set(user_message, {"answer": answer, "sources": sources, "decision": decision})
+
         return {
             "answer": answer,
             "sources": sources,
             "decision": decision,
+            "timings": timings,
+        }
+
+    async def _generate_answer(self, key: str, prompt: str) -> str:
+        answer = await self.llm.generate(prompt)
+        if self._llm_cache is not None:
+            self._llm_cache.set(key, answer)
+        return answer
+
+    async def handle_chat_stream(
+        self,
+        user_message: str,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        session_id: Optional[str] = None,
+    ) -> AsyncIterator[dict]:
+        chat_history, stored = await self._load_session(session_id, chat_history)
+        async for event in self._handle_chat_stream(user_message, chat_history, session_id):
+            if stored and event["type"] == "done":
+                await self._remember(session_id, user_message, event["answer"])
+            yield event
+
+    async def _handle_chat_stream(self, user_message: str, chat_history, session_id: Optional[str]) -> AsyncIterator[dict]:
+        t0 = time.perf_counter()
+        hit = self._semantic_hit(user_message, chat_history, t0)
+        if hit is not None:
+            observe_stages("chat_stream", hit["timings"])
+            yield {"type": "decision", "decision": hit["decision"]}
+            yield {"type": "sources", "sources": hit["sources"]}
+            yield {"type": "token", "content": hit["answer"]}
+            yield {"type": "done", "answer": hit["answer"], "timings": hit["timings"]}
+            return
+
+        history_text = await self._history_text(chat_history, session_id)
+        decision, speculative = await self._decide(user_message, history_text)
+        t_decision = time.perf_counter()
+
+        yield {"type": "decision", "decision": decision}
+
+        if decision.get("fast_response") and not decision.get("need_search"):
+            if speculative is not None:
+                speculative.cancel()
+            answer = (decision.get("fast_response_return") or "").strip()
+            yield {"type": "sources", "sources": []}
+            if answer:
+                yield {"type": "token", "content": answer}
+            timings = self._timings(t0, t_decision)
+            observe_stages("chat_stream", timings)
+            yield {"type": "done", "answer": answer, "timings": timings}
+            return
+
+        context_blocks = await self._run_searches(decision, speculative)
+        t_search = time.perf_counter()
+
+        prompt, sources = self._build_prompt(user_message, context_blocks, history_text)
+        t_prompt = time.perf_counter()
+
+        yield {"type": "sources", "sources": sources}
+
+        key = None
+        if self._llm_cache is not None:
+            key = hashlib.sha256(prompt.encode("utf-8", errors="ignore")).hexdigest()
+            cached = await self._llm_cache.aget(key)
+            if cached:
+                timings = self._timings(
+                    t0, t_decision, t_search, t_prompt, time.perf_counter(), speculative=speculative is not None
+                )
+                observe_stages("chat_stream", timings)
+                yield {"type": "token", "content": cached}
+                yield {"type": "done", "answer": cached, "timings": timings}
+                return
+
+        parts: list[str] = []
+        t_first_token = None
+        async for token in self.llm.generate_stream(prompt):
+            if t_first_token is None:
+                t_first_token = time.perf_counter()
+            parts.append(token)
+            yield {"type": "token", "content": token}
+
+        answer = "".join(parts).strip()
+        if key is not None and answer:
+            self._llm_cache.set(key, answer)
+        t_done = time.perf_counter()
+
+        timings = self._timings(t0, t_decision, t_search, t_prompt, t_done, speculative=speculative is not None)
+        timings["first_token_ms"] = round(((t_first_token or t_done) - t_prompt) * 1000, 1)
+        observe_stages("chat_stream", timings)
+
+        if answer and self._semantic_cacheable(user_message, chat_history):
+            self._semantic_cache.set(user_message, {"answer": answer, "sources": sources, "decision": decision})
+        yield {"type": "done", "answer": answer, "timings": timings}
+
+    def _timings(
+        self,
+        t0: float,
+        t_decision: float,
+        t_search: float | None = None,
+        t_prompt: float | None = None,
+        t_done: float | None = None,
+        speculative: bool = False,
+    ) -> dict:
+        t_search = t_search or t_decision
+        t_prompt = t_prompt or t_search
+        t_done = t_done or t_prompt
+        return {
+            "decision_ms": round((t_decision - t0) * 1000, 1),
+            "search_ms": round((t_search - t_decision) * 1000, 1),
+            "prompt_ms": round((t_prompt - t_search) * 1000, 1),
+            "llm_ms": round((t_done - t_prompt) * 1000, 1),
+            "total_ms": round((t_done - t0) * 1000, 1),
+            "speculative": speculative,
         }
 
-    def _build_prompt(self, user_message: str, contexts: list, chat_history="") -> tuple[str, list[dict]]:
+    async def _decide(self, user_message: str, history_text: str) -> tuple[dict, Optional[asyncio.Task]]:
+        # A cached decision needs no speculation: its queries are searched right away.
+        cached = await self.decision.cached(user_message, history_text)
+        if cached is not None:
+            return cached, None
+
+        # The keyword heuristic already tells us DecisionService will search, so the
+        # raw message is searched while _generate_queries is still running.
+        speculative = None
+        if self._speculative_search and self.decision._need_search_fast(user_message):
+            speculative = asyncio.create_task(search_and_extract(user_message))
+
+        try:
+            decision = await self.decision.run(user_message, user_history=history_text)
+        except BaseException:
+            if speculative is not None:
+                speculative.cancel()
+            raise
+
+        return decision, speculative
+
+    async def _run_searches(self, decision: dict, speculative: Optional[asyncio.Task] = None) -> list:
+        context_blocks = []
+        if not decision.get("need_search"):
+            if speculative is not None:
+                speculative.cancel()
+            return context_blocks
+
+        queries = decision.get("queries") or []
+        if self._max_search_queries > 0:
+            queries = queries[: self._max_search_queries]
+
+        if speculative is None:
+            results = await asyncio.gather(
+                *(search_and_extract(query) for query in queries),
+                return_exceptions=True,
+            )
+        else:
+            # Searches run inside SingleFlight tasks, so cancelling the late ones here
+            # still lets them finish and warm the caches.
+            tasks = [asyncio.create_task(search_and_extract(query)) for query in queries]
+            tasks.append(speculative)
+            results = await self._wait_speculative(tasks, speculative)
+
+        for search_result in results:
+            if isinstance(search_result, BaseException):
+                print(f'Search generated an exception: {search_result}')
+                continue
+            context_blocks.append(search_result)
+
+        return context_blocks
+
+    async def _wait_speculative(self, tasks: list[asyncio.Task], speculative: asyncio.Task) -> list:
+        # Once the speculative context is usable, the query searches only get a short grace period.
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.1, self._speculative_budget_s)
+        pending = set(tasks)
+        done: set[asyncio.Task] = set()
+        while pending:
+            if speculative in done and self._has_usable_source(speculative):
+                deadline = min(deadline, loop.time() + self._speculative_grace_s)
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+
+            finished, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            done |= finished
+
+        for task in pending:
+            task.cancel()
+
+        return [
+            task.exception() or task.result()
+            for task in tasks
+            if task in done and not task.cancelled()
+        ]
+
+    def _has_usable_source(self, task: asyncio.Task) -> bool:
+        if task.cancelled() or task.exception() is not None:
+            return False
+        return any(len(r.get("content") or "") >= 128 for r in task.result().get("results", []))
+
+    def _build_prompt(self, user_message: str, contexts: list, history_text: str = "") -> tuple[str, list[dict]]:
         seen_urls = set()
+        seen_fingerprints = []
         sources_list = []
         context_text = ""
-        clean_prompt = ""
-        
+
         prompt_template = load_prompt("answer.prompt")
-        
+        fixed_tokens = count_tokens(prompt_template) + count_tokens(user_message)
+        budget = max(0, self._prompt_max_tokens - fixed_tokens)
+        history_tokens = count_tokens(history_text or "")
+        remaining = budget - min(history_tokens, int(budget * self._history_share))
+
         for ctx in contexts:
-            added = False
-            
-            context_text += f"\n[QUERY]: {ctx['query']}\n"
-            
             for r in ctx["results"]:
-                if(added):
-                    break
-                
                 url = r["url"]
                 content = r.get("content", "")
-                
+
                 if(url in seen_urls or not content or "ERROR extracting" in content or len(content) < 128):
                     continue
-                
+
+                # The same syndicated text found by another query adds nothing.
+                fingerprint = simhash(content)
+                if any(hamming(fingerprint, seen) <= self._source_dedup_distance for seen in seen_fingerprints):
+                    continue
+
+                if len(content) > self._max_source_chars:
+                    content = clip_to_sentence(content[: self._max_source_chars])
+                block = f"\n[QUERY]: {ctx['query']}\n- Source: {url}\n  Content: "
+                allowance = min(self._source_max_tokens, remaining - count_tokens(block) - 1)
+                content_trimmed = trim_to_tokens(content, allowance)
+                if len(content_trimmed) < 128:
+                    break
+
                 seen_urls.add(url)
+                seen_fingerprints.append(fingerprint)
                 sources_list.append({
                     "url": url,
                     "title": r.get("title", ""),
                     "query": ctx['query']
                 })
-                
-                context_text += f"- Source: {r['url']}\n"
-                content_trimmed = (r.get("content", "") or "")[: self._max_source_chars]
-                context_text += f"  Content: {content_trimmed}\n"
-                added = True
-                
-        prompt = prompt_template.replace("{{user_message}}", user_message)
-        
-        
-        # if context_text != "" and len(context_text) > 8000:
-        #     clean_prompt = self.cleantext.clean(context_text)
-        # else:
-        clean_prompt = context_text
 
-        clean_prompt = self._truncate(clean_prompt, self._max_context_chars)
+                block += f"{content_trimmed}\n"
+                context_text += block
+                remaining -= count_tokens(block)
+                break
 
-        prompt = prompt.replace("{{context_text}}", clean_prompt)
-        
-        
-        history_text = ""
-        if isinstance(chat_history, list):
-            history_text = self._format_history(chat_history)
-        else:
-            history_text = self._truncate(chat_history or "", self._max_history_chars)
-            
+        history_text = trim_history(history_text or "", budget - count_tokens(context_text))
+
+        prompt = prompt_template.replace("{{user_message}}", user_message)
+        prompt = prompt.replace("{{context_text}}", context_text)
         final_prompt = prompt.replace("{{user_history}}", history_text)
 
         return final_prompt, sources_list
-        
-    def handle_scan(self, image_url: str) -> dict:
+
+    async def _load_image(self, image_url: str) -> tuple[str, Optional[int]]:
+        # Returns what to send to the model and the perceptual hash, falling back
+        # to the plain URL when the image cannot be fetched or decoded here.
+        if self._image_hash_cache is None or image_url.startswith("data:"):
+            return image_url, None
+        try:
+            raw, content_type = await fetch_image(image_url)
+            image_hash = await asyncio.to_thread(dhash, raw)
+        except Exception as e:
+            print(f"Image fetch failed, sending URL to model: {e}")
+            return image_url, None
+        return to_data_url(raw, content_type), image_hash
+
+    async def handle_scan(self, image_url: str) -> dict:
         t0 = time.perf_counter()
-        
-        
+
+        cache_key = None
         if self._image_cache is not None:
             cache_key = hashlib.sha256(image_url.encode("utf-8", errors="ignore")).hexdigest()
-            cached = self._image_cache.get(cache_key)
+            cached = await self._image_cache.aget(cache_key)
             if cached:
-                if self._profile:
-                    print(f"LATENCY(ms): image_scan=0 (cached) total={(time.perf_counter() - t0) * 1000:.0f}")
+                observe_stages("foodscan", {"total_ms": (time.perf_counter() - t0) * 1000})
                 return cached
-        
+
+        image_input, image_hash = await self._load_image(image_url)
+        t_fetch = time.perf_counter()
+        if image_hash is not None:
+            cached = self._image_hash_cache.get(image_hash)
+            if cached:
+                self._image_cache.set(cache_key, cached)
+                observe_stages(
+                    "foodscan",
+                    {"fetch_ms": (t_fetch - t0) * 1000, "total_ms": (time.perf_counter() - t0) * 1000},
+                )
+                return cached
+
+        inflight_key = str(image_hash) if image_hash is not None else image_url
+        result = await self._image_inflight.do(inflight_key, lambda: self._scan_image(image_input, image_hash))
+        if cache_key is not None:
+            self._image_cache.set(cache_key, result)
+
+        observe_stages("foodscan", {"fetch_ms": (t_fetch - t0) * 1000, "total_ms": (time.perf_counter() - t0) * 1000})
+        return result
+
+    async def _run_batch(self, keys: List[str], cached, run, concurrency: int) -> AsyncIterator[tuple]:
+        # Yields (index, result, error) per input position as soon as its key finishes.
+        # Duplicate keys run once and cache hits are yielded before any work starts.
+        positions: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            positions.setdefault(key, []).append(i)
+
+        pending_keys = []
+        for key in positions:
+            hit = await cached(key)
+            if hit:
+                for i in positions[key]:
+                    yield i, hit, None
+            else:
+                pending_keys.append(key)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def guarded(key: str):
+            async with semaphore:
+                return await run(key)
+
+        task_to_key = {asyncio.create_task(guarded(key)): key for key in pending_keys}
+        pending = set(task_to_key)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result, error = task.result(), None
+                    except Exception as e:
+                        result, error = None, str(e).strip() or e.__class__.__name__
+                    for i in positions[task_to_key[task]]:
+                        yield i, result, error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def handle_scan_batch(self, image_urls: List[str]) -> AsyncIterator[dict]:
+        async def cached(url: str):
+            if self._image_cache is None:
+                return None
+            return await self._image_cache.aget(hashlib.sha256(url.encode("utf-8", errors="ignore")).hexdigest())
+
+        async for i, result, error in self._run_batch(image_urls, cached, self.handle_scan, self._scan_batch_concurrency):
+            if error is not None:
+                yield {"index": i, "image_url": image_urls[i], "error": error}
+            else:
+                yield {"index": i, "image_url": image_urls[i], "response": result}
+
+    async def _scan_image(self, image_input: str, image_hash: Optional[int]) -> dict:
         t_prompt = time.perf_counter()
         prompt = load_prompt("analyze_image.prompt")
         t_llm = time.perf_counter()
-        raw = self.llm.image_scan(image_url, prompt)
+        raw = await self.llm.image_scan(image_input, prompt)
         t_parse = time.perf_counter()
 
         try:
             result = json.loads(raw)
-            
-            
-            if self._image_cache is not None:
-                self._image_cache.set(cache_key, result)
-            
-            t_done = time.perf_counter()
-            if self._profile:
-                print(
-                    f"LATENCY(ms): "
-                    f"prompt={(t_llm - t_prompt) * 1000:.0f} "
-                    f"llm={(t_parse - t_llm) * 1000:.0f} "
-                    f"parse={(t_done - t_parse) * 1000:.0f} "
-                    f"total={(t_done - t0) * 1000:.0f}"
-                )
-            
-            return result
         except json.JSONDecodeError:
             raise ValueError(f"Invalid JSON from image_scan:\n{raw}")
 
-    def handle_user_insight(self, payload: dict) -> dict:
-        if not isinstance(payload, dict):
-            raise ValueError("payload must be a dict")
+        if image_hash is not None:
+            self._image_hash_cache.set(image_hash, result)
 
-        t0 = time.perf_counter()
+        t_done = time.perf_counter()
+        observe_stages(
+            "foodscan",
+            {
+                "prompt_ms": (t_llm - t_prompt) * 1000,
+                "llm_ms": (t_parse - t_llm) * 1000,
+                "parse_ms": (t_done - t_parse) * 1000,
+            },
+        )
+        return result
 
+    def _user_insight_key(self, payload: dict) -> str:
         payload_json = json.dumps(payload, ensure_ascii=False, sort_keys=True)
-        if self._user_insight_cache is not None:
-            cache_key = hashlib.sha256(payload_json.encode("utf-8", errors="ignore")).hexdigest()
-            cached = self._user_insight_cache.get(cache_key)
-            if cached:
-                if self._profile:
-                    print(
-                        f"LATENCY(ms): user_insight=0 (cached) total={(time.perf_counter() - t0) * 1000:.0f}"
-                    )
-                return cached
-        else:
-            cache_key = None
+        return hashlib.sha256(payload_json.encode("utf-8", errors="ignore")).hexdigest()
 
+    def _user_insight_prompt(self, payload: dict) -> str:
         prompt_tmpl = load_prompt("user_insight.prompt")
-        prompt = prompt_tmpl.replace(
+        return prompt_tmpl.replace(
             "{{payload_json}}",
             json.dumps(payload, ensure_ascii=False, indent=2),
         )
 
-        t_llm = time.perf_counter()
-        raw = self.llm.tools_with_limits(
-            prompt,
-            max_completion_tokens=int(os.getenv("USER_INSIGHT_MAX_TOKENS", "512")),
-            response_format={"type": "json_object"},
-        )
-        t_parse = time.perf_counter()
-
+    def _normalize_user_insight(self, raw: str) -> dict:
         try:
             result = json.loads(raw)
         except json.JSONDecodeError:
@@ -324,23 +660,117 @@ class Orchestrator:
         personal_ai_insight = str(result.get("personal_ai_insight") or "").strip()
         ai_important_notice = str(result.get("ai_important_notice") or "").strip()
 
-        normalized = {
+        return {
             "health_score": health_score,
             "personal_ai_insight": personal_ai_insight,
             "ai_important_notice": ai_important_notice,
             "confidence_level": confidence_level,
         }
 
-        if self._user_insight_cache is not None and cache_key is not None:
+    async def handle_user_insight(self, payload: dict) -> dict:
+        if not isinstance(payload, dict):
+            raise ValueError("payload must be a dict")
+
+        t0 = time.perf_counter()
+
+        cache_key = self._user_insight_key(payload)
+        if self._user_insight_cache is not None:
+            cached = await self._user_insight_cache.aget(cache_key)
+            if cached:
+                observe_stages("user_insight", {"total_ms": (time.perf_counter() - t0) * 1000})
+                return cached
+
+        normalized = await self._user_insight_inflight.do(cache_key, lambda: self._generate_user_insight(payload, cache_key))
+        observe_stages("user_insight", {"total_ms": (time.perf_counter() - t0) * 1000})
+        return normalized
+
+    async def _generate_user_insight(self, payload: dict, cache_key: str) -> dict:
+        prompt = self._user_insight_prompt(payload)
+
+        t_llm = time.perf_counter()
+        raw = await self.llm.tools_with_limits(
+            prompt,
+            max_completion_tokens=self._user_insight_max_tokens,
+            response_format={"type": "json_object"},
+        )
+        t_parse = time.perf_counter()
+
+        normalized = self._normalize_user_insight(raw)
+
+        if self._user_insight_cache is not None:
             self._user_insight_cache.set(cache_key, normalized)
 
         t_done = time.perf_counter()
-        if self._profile:
-            print(
-                f"LATENCY(ms): "
-                f"llm={(t_parse - t_llm) * 1000:.0f} "
-                f"parse={(t_done - t_parse) * 1000:.0f} "
-                f"total={(t_done - t0) * 1000:.0f}"
-            )
+        observe_stages(
+            "user_insight",
+            {
+                "llm_ms": (t_parse - t_llm) * 1000,
+                "parse_ms": (t_done - t_parse) * 1000,
+            },
+        )
+        return normalized
+
+    async def handle_user_insight_batch(self, payloads: List[dict]) -> AsyncIterator[dict]:
+        if any(not isinstance(p, dict) for p in payloads):
+            raise ValueError("payload must be a dict")
+
+        keys = [self._user_insight_key(p) for p in payloads]
+        by_key = dict(zip(keys, payloads))
 
-        return normalized
\ No newline at end of file
+        async def cached(key: str):
+            return await self._user_insight_cache.aget(key) if self._user_insight_cache is not None else None
+
+        async def run(key: str) -> dict:
+            return await self.handle_user_insight(by_key[key])
+
+        async for i, result, error in self._run_batch(keys, cached, run, self._user_insight_batch_concurrency):
+            if error is not None:
+                yield {"index": i, "error": error}
+            else:
+                yield {"index": i, "response": result}
+
+    def build_user_insight_batch(self, payloads: List[dict]) -> tuple[str, List[str]]:
+        # One Batch API request per distinct payload; custom_id is the payload hash
+        # so results map back to every input that shares it.
+        keys = [self._user_insight_key(p) for p in payloads]
+        lines = []
+        seen: set[str] = set()
+        for key, payload in zip(keys, payloads):
+            if key in seen:
+                continue
+            seen.add(key)
+            body = self.llm.batch_request_body(
+                self._user_insight_prompt(payload),
+                max_completion_tokens=self._user_insight_max_tokens,
+                response_format={"type": "json_object"},
+            )
+            lines.append(json.dumps(
+                {"custom_id": key, "method": "POST", "url": "/v1/chat/completions", "body": body},
+                ensure_ascii=False,
+            ))
+        return "\n".join(lines) + "\n", keys
+
+    def parse_user_insight_batch(self, output_jsonl: str) -> Dict[str, dict]:
+        results: Dict[str, dict] = {}
+        for line in output_jsonl.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            key = item.get("custom_id")
+            response = item.get("response") or {}
+            try:
+                if item.get("error") or response.get("status_code") != 200:
+                    raise RuntimeError(str(item.get("error") or response.get("body") or "batch request failed"))
+                choices = (response.get("body") or {}).get("choices") or []
+                content = ((choices[0].get("message") or {}).get("content") or "") if choices else ""
+                if not content:
+                    raise RuntimeError("Empty content from OpenAI batch")
+                normalized = self._normalize_user_insight(content)
+            except Exception as e:
+                results[key] = {"error": str(e).strip() or e.__class__.__name__}
+                continue
+
+            if self._user_insight_cache is not None:
+                self._user_insight_cache.set(key, normalized)
+            results[key] = {"response": normalized}
+        return results
@@ -0,0 +1,174 @@
+import hashlib
+import re
+import threading
+import time
+import weakref
+from typing import Any, Optional
+
+import numpy as np
+
+from app.core.metrics import CallbackMetric
+
+
+_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# Filler words that change how a question is phrased but not what is asked.
+# Negations are deliberately not here: "boleh" and "tidak boleh" are different questions.
+_STOPWORDS = {
+    "apa", "apakah", "kah", "sih", "dong",
+    "ya", "yg", "yang", "itu", "ini", "nya", "deh", "kok", "kan", "aja", "saja", "tolong",
+    "min", "kak", "bro", "sis", "mau", "tanya", "boleh", "bisa", "gimana", "bagaimana",
+}
+
+# Spelling variants that would otherwise produce unrelated n-grams.
+_SYNONYMS = {
+    "tiap": "setiap",
+    "tiaphari": "setiap hari",
+    "brp": "berapa",
+    "gmn": "bagaimana",
+    "utk": "untuk",
+    "dgn": "dengan",
+    "bgt": "banget",
+    "ga": "tidak",
+    "gak": "tidak",
+    "gk": "tidak",
+    "nggak": "tidak",
+    "enggak": "tidak",
+    "ngga": "tidak",
+    "tak": "tidak",
+    "jgn": "jangan",
+    "blm": "belum",
+}
+
+_NEGATIONS = {"tidak", "bukan", "jangan", "belum", "tanpa"}
+
+# "aman ga", "boleh gak", "bisa nggak": after these words, or at the end of the
+# question, a negation only means "or not" and does not flip what is asked.
+_TAG_HEADS = {
+    "aman", "boleh", "bisa", "baik", "bagus", "sehat", "bahaya", "berbahaya", "perlu", "harus",
+    "benar", "bener", "normal", "wajar", "efektif", "ampuh", "cocok", "apa", "ya",
+}
+
+
+def _words(text: str) -> list[str]:
+    words = _WORD_RE.sub(" ", (text or "").lower()).split()
+    words = " ".join(_SYNONYMS.get(w, w) for w in words).split()
+    return [
+        w
+        for i, w in enumerate(words)
+        if not (w in _NEGATIONS and (i == len(words) - 1 or (i > 0 and words[i - 1] in _TAG_HEADS)))
+    ]
+
+
+def normalize(text: str) -> str:
+    return " ".join(w for w in _words(text) if w not in _STOPWORDS)
+
+
+def gate_key(text: str) -> int:
+    # What the vectors cannot be trusted with: every number with its multiplicity
+    # and whether the question is negated. A hit needs this to match exactly, so
+    # "5 tahun" never answers "1 tahun" and "tidak boleh" never answers "boleh";
+    # everything else is left to the cosine threshold.
+    words = _words(text)
+    numbers = sorted(w for w in words if any(c.isdigit() for c in w))
+    negated = sum(w in _NEGATIONS for w in words) % 2
+    digest = hashlib.blake2b(("\0".join(numbers) + f"\1{negated}").encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def embed(text: str, dim: int = 1024) -> np.ndarray:
+    # Hashed character 3/4-grams plus whole words, L2-normalized so dot product is cosine.
+    vec = np.zeros(dim, dtype=np.float32)
+    words = normalize(text).split()
+    if not words:
+        return vec
+
+    features: list[str] = list(words)
+    for word in words:
+        padded = f" {word} "
+        for n in (3, 4):
+            features.extend(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+
+    norm = float(np.linalg.norm(vec))
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+_caches: "weakref.WeakSet[SemanticCache]" = weakref.WeakSet()
+
+
+for _field in ("hits", "misses"):
+    CallbackMetric(
+        f"dinacom_semantic_cache_{_field}_total",
+        f"Semantic answer cache {_field}.",
+        "counter",
+        lambda field=_field: (({}, sum(c.stats()[field] for c in list(_caches))),),
+    )
+
+
+class SemanticCache:
+    # Brute-force cosine search over a fixed-size ring buffer; a few thousand
+    # entries scan in well under a millisecond, so no ANN index is needed.
+    def __init__(self, threshold: float = 0.85, ttl: float = 3600, max_entries: int = 5000, dim: int = 1024):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.dim = dim
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._keys = np.zeros(self.max_entries, dtype=np.uint64)
+        self._expires = np.zeros(self.max_entries, dtype=np.float64)
+        self._values: list[Any] = [None] * self.max_entries
+        self._next = 0
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, text: str) -> Optional[Any]:
+        vec = embed(text, self.dim)
+        if not vec.any():
+            return None
+        key = np.uint64(gate_key(text))
+
+        now = time.monotonic()
+        with self._lock:
+            if self._size:
+                scores = self._vectors[: self._size] @ vec
+                scores[self._expires[: self._size] < now] = -1.0
+                scores[self._keys[: self._size] != key] = -1.0
+                index = int(np.argmax(scores))
+                if scores[index] >= self.threshold:
+                    self.hits += 1
+                    return self._values[index]
+            self.misses += 1
+            return None
+
+    def set(self, text: str, value: Any) -> None:
+        vec = embed(text, self.dim)
+        if not vec.any():
+            return
+        key = np.uint64(gate_key(text))
+
+        with self._lock:
+            index = self._next
+            self._vectors[index] = vec
+            self._keys[index] = key
+            self._expires[index] = time.monotonic() + self.ttl
+            self._values[index] = value
+            self._next = (index + 1) % self.max_entries
+            self._size = max(self._size, index + 1)
+
+    def __len__(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            return int((self._expires[: self._size] >= now).sum())
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": self._size}
@@ -0,0 +1,97 @@
+import math
+import os
+import re
+from functools import lru_cache
+
+_MODEL = os.getenv("OPENAI_MAIN_MODEL", "gpt-4o-mini")
+_FALLBACK_ENCODING = os.getenv("TOKENIZER_FALLBACK_ENCODING", "o200k_base")
+# Used when no BPE encoding is available; deliberately overestimates Indonesian text.
+_CHARS_PER_TOKEN = float(os.getenv("TOKENIZER_CHARS_PER_TOKEN", "3"))
+
+_SENTENCE_END = re.compile(r"[.!?;:](?=\s)|\n")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # tiktoken downloads its BPE files on first use unless TIKTOKEN_CACHE_DIR already
+    # holds them; without either, token counts fall back to a character estimate.
+    try:
+        import tiktoken
+    except Exception:
+        return None
+
+    try:
+        return tiktoken.encoding_for_model(_MODEL)
+    except Exception:
+        pass
+    try:
+        return tiktoken.get_encoding(_FALLBACK_ENCODING)
+    except Exception as e:
+        print(f"Tokenizer unavailable, estimating tokens from characters: {e.__class__.__name__}")
+        return None
+
+
+def warmup() -> bool:
+    # Loads the encoding ahead of the first request; blocking, run it in a thread.
+    return _encoding() is not None
+
+
+@lru_cache(maxsize=2048)
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is None:
+        return math.ceil(len(text) / _CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def _cut_head(text: str, max_tokens: int) -> str:
+    enc = _encoding()
+    if enc is None:
+        return text[: int(max_tokens * _CHARS_PER_TOKEN)]
+    return enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+
+
+def _cut_tail(text: str, max_tokens: int) -> str:
+    enc = _encoding()
+    if enc is None:
+        return text[-int(max_tokens * _CHARS_PER_TOKEN):]
+    return enc.decode(enc.encode(text, disallowed_special=())[-max_tokens:])
+
+
+def clip_to_sentence(cut: str) -> str:
+    # Ends an already-cut text on a sentence boundary in its second half, otherwise
+    # on a word boundary.
+    ends = [m.end() for m in _SENTENCE_END.finditer(cut)]
+    if ends and ends[-1] >= len(cut) // 2:
+        return cut[: ends[-1]].rstrip()
+
+    space = cut.rfind(" ")
+    if space >= len(cut) // 2:
+        return cut[:space].rstrip()
+    return cut.rstrip()
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    # Keeps the beginning of text within max_tokens, cut at a sentence boundary.
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    return clip_to_sentence(_cut_head(text, max_tokens))
+
+
+def trim_tail_to_tokens(text: str, max_tokens: int) -> str:
+    # Keeps the end of text within max_tokens, starting after a line or word boundary.
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    cut = _cut_tail(text, max_tokens)
+    for sep in ("\n", " "):
+        index = cut.find(sep)
+        if 0 <= index < len(cut) // 2:
+            return cut[index + 1:]
+    return cut
@@ -1,17 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 from app.ai.orchestrator import Orchestrator
-from app.dependency.deps import verify_token
+from app.dependency.deps import get_orchestrator, verify_token
 import traceback
+import json
 
 router = APIRouter()
-orchestrator = Orchestrator()
 
 class ChatRequest(BaseModel):
     message: str
     chat_history: Optional[List[Dict[str, str]]] = None
+    session_id: Optional[str] = None
 
 class SourceInfo(BaseModel):
     url: str
@@ -22,15 +23,20 @@ class ChatResponse(BaseModel):
     answer: str
     sources: List[SourceInfo]
     decision: Dict[str, Any]
+    timings: Optional[Dict[str, Any]] = None
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, _: bool = Depends(verify_token)):
+async def chat(
+    request: ChatRequest,
+    _: bool = Depends(verify_token),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
     try:
         if not request.message.strip():
             raise HTTPException(status_code=400, detail="Message tidak boleh kosong")
         
         
-        response = await run_in_threadpool(orchestrator.handle_chat, request.message, request.chat_history)
+        response = await orchestrator.handle_chat(request.message, request.chat_history, request.session_id)
         return ChatResponse(**response)
     
     except Exception as e:
@@ -38,3 +44,37 @@ async def chat(request: ChatRequest, _: bool = Depends(verify_token)):
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    _: bool = Depends(verify_token),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message tidak boleh kosong")
+
+    async def event_stream():
+        try:
+            async for event in orchestrator.handle_chat_stream(request.message, request.chat_history, request.session_id):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            print(f"ERROR in chat stream endpoint: {str(e)}")
+            print(traceback.format_exc())
+            yield json.dumps({"type": "error", "detail": f"Error: {str(e)}"}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/chat/sessions/{session_id}")
+async def clear_session(
+    session_id: str,
+    _: bool = Depends(verify_token),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    await orchestrator.clear_session(session_id)
+    return {"status": "success", "session_id": session_id}
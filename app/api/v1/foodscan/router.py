@@ -1,15 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 from app.ai.orchestrator import Orchestrator
-from app.dependency.deps import verify_token
+from app.dependency.deps import get_orchestrator, verify_token
 from openai import APITimeoutError
+import json
+import os
 import traceback
 
 
 router = APIRouter()
-orchestrator = Orchestrator()
 
 class ChatRequest(BaseModel):
     image_url: str
@@ -17,13 +18,31 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: Dict[str, Any]
 
+class BatchRequest(BaseModel):
+    image_urls: List[str]
+    stream: bool = False
+
+class BatchItem(BaseModel):
+    image_url: str
+    response: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItem]
+
+_BATCH_MAX_ITEMS = int(os.getenv("FOODSCAN_BATCH_MAX_ITEMS", "20"))
+
 @router.post("/foodscan", response_model=ChatResponse)
-async def chat(request: ChatRequest, _: bool = Depends(verify_token)):
+async def chat(
+    request: ChatRequest,
+    _: bool = Depends(verify_token),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
     try:
         if not request.image_url.strip():
             raise HTTPException(status_code=400, detail="image_url tidak boleh kosong")
         
-        response = await run_in_threadpool(orchestrator.handle_scan, request.image_url)
+        response = await orchestrator.handle_scan(request.image_url)
         return ChatResponse(response=response)
 
     except APITimeoutError:
@@ -37,3 +56,46 @@ async def chat(request: ChatRequest, _: bool = Depends(verify_token)):
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+
+@router.post("/foodscan/batch", response_model=BatchResponse)
+async def scan_batch(
+    request: BatchRequest,
+    _: bool = Depends(verify_token),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    image_urls = [u.strip() for u in request.image_urls]
+    if not image_urls or any(not u for u in image_urls):
+        raise HTTPException(status_code=400, detail="image_urls tidak boleh kosong")
+    if len(image_urls) > _BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Maksimal {_BATCH_MAX_ITEMS} gambar per batch")
+
+    if request.stream:
+        async def event_stream():
+            try:
+                async for event in orchestrator.handle_scan_batch(image_urls):
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as e:
+                print(f"ERROR in foodscan batch endpoint: {str(e)}")
+                print(traceback.format_exc())
+                yield json.dumps({"error": f"Error: {str(e)}"}, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        results: List[Optional[BatchItem]] = [None] * len(image_urls)
+        async for event in orchestrator.handle_scan_batch(image_urls):
+            results[event["index"]] = BatchItem(
+                image_url=event["image_url"],
+                response=event.get("response"),
+                error=event.get("error"),
+            )
+        return BatchResponse(results=results)
+
+    except Exception as e:
+        print(f"ERROR in foodscan batch endpoint: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -1,4 +1,6 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import render
 from app.api.v1.chat.router import router as chat_router
 from app.api.v1.foodscan.router import router as foodscan_router
 from app.api.v1.user_insight.router import router as user_insight_router
@@ -15,4 +17,8 @@ async def ping():
         "status": "success",
         "message": "pong",
         "date": datetime.utcnow().isoformat()
-    }
\ No newline at end of file
+    }
+
+@api_router.get("/metrics", tags=["Utility"])
+async def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
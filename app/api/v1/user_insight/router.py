@@ -1,15 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.concurrency import run_in_threadpool
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import Any, Dict, List, Optional
 from app.ai.orchestrator import Orchestrator
-from app.dependency.deps import verify_token
+from app.dependency.deps import get_orchestrator, verify_token
 from openai import APITimeoutError
+import json
+import os
 import traceback
 
 
 router = APIRouter()
-orchestrator = Orchestrator()
 
 
 class UserInfo(BaseModel):
@@ -58,11 +59,45 @@ class UserInsightResponse(BaseModel):
     confidence_level: int
 
 
+class UserInsightBatchRequest(BaseModel):
+    items: List[UserInsightRequest]
+    stream: bool = False
+
+
+class UserInsightBatchItem(BaseModel):
+    user_id: str
+    response: Optional[UserInsightResponse] = None
+    error: Optional[str] = None
+
+
+class UserInsightBatchResponse(BaseModel):
+    results: List[UserInsightBatchItem]
+
+
+_BATCH_MAX_ITEMS = int(os.getenv("USER_INSIGHT_BATCH_MAX_ITEMS", "1000"))
+
+
+async def _read_batch(http_request: Request) -> UserInsightBatchRequest:
+    # application/x-ndjson bodies carry one UserInsightRequest per line and always stream back.
+    body = await http_request.body()
+    try:
+        if "ndjson" in (http_request.headers.get("content-type") or ""):
+            items = [UserInsightRequest.model_validate_json(line) for line in body.splitlines() if line.strip()]
+            return UserInsightBatchRequest(items=items, stream=True)
+        return UserInsightBatchRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+
+
 @router.post("/user-insight", response_model=UserInsightResponse)
-async def user_insight(request: UserInsightRequest, _: bool = Depends(verify_token)):
+async def user_insight(
+    request: UserInsightRequest,
+    _: bool = Depends(verify_token),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
     try:
         payload = request.to_payload()
-        response = await run_in_threadpool(orchestrator.handle_user_insight, payload)
+        response = await orchestrator.handle_user_insight(payload)
         return UserInsightResponse(**response)
 
     except APITimeoutError:
@@ -76,3 +111,60 @@ async def user_insight(request: UserInsightRequest, _: bool = Depends(verify_tok
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+
+@router.post(
+    "/user-insight/batch",
+    response_model=UserInsightBatchResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": UserInsightBatchRequest.model_json_schema()},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        },
+    },
+)
+async def user_insight_batch(
+    http_request: Request,
+    _: bool = Depends(verify_token),
+    orchestrator: Orchestrator = Depends(get_orchestrator),
+):
+    request = await _read_batch(http_request)
+    if not request.items:
+        raise HTTPException(status_code=400, detail="items tidak boleh kosong")
+    if len(request.items) > _BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Maksimal {_BATCH_MAX_ITEMS} item per batch")
+
+    payloads = [item.to_payload() for item in request.items]
+
+    if request.stream:
+        async def event_stream():
+            try:
+                async for event in orchestrator.handle_user_insight_batch(payloads):
+                    event["user_id"] = payloads[event["index"]]["user"]["id"]
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Exception as e:
+                print(f"ERROR in user_insight batch endpoint: {str(e)}")
+                print(traceback.format_exc())
+                yield json.dumps({"error": f"Error: {str(e)}"}, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    try:
+        results: List[Optional[UserInsightBatchItem]] = [None] * len(payloads)
+        async for event in orchestrator.handle_user_insight_batch(payloads):
+            results[event["index"]] = UserInsightBatchItem(
+                user_id=payloads[event["index"]]["user"]["id"],
+                response=event.get("response"),
+                error=event.get("error"),
+            )
+        return UserInsightBatchResponse(results=results)
+
+    except Exception as e:
+        print(f"ERROR in user_insight batch endpoint: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -0,0 +1,139 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        _registry.append(self)
+
+    def samples(self) -> Iterable[tuple[str, dict, float]]:
+        return []
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, **labels) -> None:
+        key = tuple(labels.items())
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(key), value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = _LATENCY_BUCKETS_MS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.items())
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        for key, (counts, total, count) in items:
+            labels = dict(key)
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class CallbackMetric(_Metric):
+    # Values are read at scrape time, so sources that already keep counters cost nothing per request.
+    def __init__(self, name: str, help: str, type: str, fn: Callable[[], Iterable[tuple[dict, float]]]):
+        super().__init__(name, help)
+        self.type = type
+        self._fn = fn
+
+    def samples(self):
+        for labels, value in self._fn():
+            yield self.name, labels, value
+
+
+STAGE_LATENCY_MS = Histogram(
+    "dinacom_stage_latency_ms",
+    "Latency of pipeline stages in milliseconds.",
+)
+
+LLM_REQUESTS = Counter(
+    "dinacom_llm_requests_total",
+    "OpenAI chat completion requests.",
+)
+
+LLM_TOKENS = Counter(
+    "dinacom_llm_tokens_total",
+    "OpenAI token usage reported in response.usage.",
+)
+
+SEARCH_EXTRACTIONS = Counter(
+    "dinacom_search_extractions_total",
+    "URL extractions started by search, by reason.",
+)
+
+
+def observe_stages(endpoint: str, timings: dict) -> None:
+    for key, value in timings.items():
+        if key.endswith("_ms") and isinstance(value, (int, float)):
+            STAGE_LATENCY_MS.observe(value, endpoint=endpoint, stage=key[:-3])
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in list(_registry):
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -1,4 +1,5 @@
-from fastapi import Header, HTTPException, status
+from fastapi import Header, HTTPException, Request, status
+from app.ai.orchestrator import Orchestrator
 from app.core.config import settings
 
 def verify_token(authorization: str = Header(...)):
@@ -18,3 +19,14 @@ def verify_token(authorization: str = Header(...)):
         )
 
     return True
+
+
+def get_orchestrator(request: Request) -> Orchestrator:
+    orchestrator = getattr(request.app.state, "orchestrator", None)
+    if orchestrator is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Orchestrator is not initialized"
+        )
+
+    return orchestrator
@@ -0,0 +1,108 @@
+"""Bulk user-insight generation for the nightly job.
+
+Reads one UserInsightRequest payload per line and writes one result per line,
+in input order: {"index", "user_id", "response"} or {"index", "user_id", "error"}.
+
+    python -m app.jobs.user_insight_batch --input users.jsonl --output insights.jsonl
+    python -m app.jobs.user_insight_batch --input users.jsonl --output insights.jsonl --mode batch
+
+--mode direct runs the requests now with bounded concurrency; --mode batch
+submits them through the OpenAI Batch API (JSONL in, JSONL out) and polls
+until the batch finishes. Both paths share the single endpoint's validation.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+
+_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _read_payloads(path: str) -> list[dict]:
+    from app.api.v1.user_insight.router import UserInsightRequest
+
+    payloads = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                payloads.append(UserInsightRequest.model_validate_json(line).to_payload())
+            except Exception as e:
+                raise ValueError(f"{path}:{n}: invalid payload: {e}") from e
+    return payloads
+
+
+async def run_direct(orchestrator, payloads: list[dict]) -> list[dict]:
+    results: list[dict] = [{} for _ in payloads]
+    async for event in orchestrator.handle_user_insight_batch(payloads):
+        results[event["index"]] = event
+    return results
+
+
+async def run_batch(orchestrator, payloads: list[dict], poll_interval_s: float = 30, timeout_s: float = 86400) -> list[dict]:
+    requests_jsonl, keys = orchestrator.build_user_insight_batch(payloads)
+    batch_id = await orchestrator.llm.submit_batch(requests_jsonl)
+    print(f"submitted batch {batch_id} ({len(set(keys))} requests)")
+
+    deadline = time.monotonic() + timeout_s
+    while True:
+        batch = await orchestrator.llm.retrieve_batch(batch_id)
+        if batch.status in _TERMINAL_STATUSES:
+            break
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Batch {batch_id} still {batch.status} after {timeout_s:.0f}s")
+        await asyncio.sleep(poll_interval_s)
+
+    parsed: dict[str, dict] = {}
+    if batch.output_file_id:
+        parsed.update(orchestrator.parse_user_insight_batch(await orchestrator.llm.download_file(batch.output_file_id)))
+    if batch.error_file_id:
+        parsed.update(orchestrator.parse_user_insight_batch(await orchestrator.llm.download_file(batch.error_file_id)))
+
+    results = []
+    for i, key in enumerate(keys):
+        item = parsed.get(key) or {"error": f"No result in batch {batch_id} ({batch.status})"}
+        results.append({"index": i, **item})
+    return results
+
+
+async def _run(args: argparse.Namespace) -> None:
+    from app.ai.orchestrator import Orchestrator
+
+    payloads = _read_payloads(args.input)
+    orchestrator = Orchestrator()
+    try:
+        if args.mode == "batch":
+            results = await run_batch(orchestrator, payloads, args.poll_interval_s, args.timeout_s)
+        else:
+            results = await run_direct(orchestrator, payloads)
+    finally:
+        await orchestrator.aclose()
+
+    errors = 0
+    with open(args.output, "w", encoding="utf-8") as f:
+        for payload, result in zip(payloads, results):
+            errors += 1 if "error" in result else 0
+            f.write(json.dumps({**result, "user_id": payload["user"]["id"]}, ensure_ascii=False) + "\n")
+    print(f"wrote {len(results)} results ({errors} errors) to {args.output}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--mode", choices=["direct", "batch"], default="direct")
+    parser.add_argument("--poll-interval-s", type=float, default=30)
+    parser.add_argument("--timeout-s", type=float, default=86400)
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,32 @@ if str(PROJECT_ROOT) not in sys.path:
 
 load_dotenv(PROJECT_ROOT / ".env")
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from app.ai import tokens
+from app.ai.orchestrator import Orchestrator
 from app.api.v1.router import api_router
 from app.core.config import settings
+from app.services.image import fetcher
+from app.services.search import extractor, google_search, parse_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	await asyncio.to_thread(tokens.warmup)
+	app.state.orchestrator = Orchestrator()
+	try:
+		yield
+	finally:
+		await app.state.orchestrator.aclose()
+		await google_search.aclose()
+		await extractor.aclose()
+		await fetcher.aclose()
+		parse_pool.shutdown()
+
 
-app = FastAPI(title=settings.app_name)
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 app.include_router(api_router, prefix="/api/v1")
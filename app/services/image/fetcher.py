@@ -0,0 +1,113 @@
+import asyncio
+import base64
+import ipaddress
+import os
+import socket
+
+import httpcore
+import httpx
+
+_FETCH_TIMEOUT_S = float(os.getenv("IMAGE_FETCH_TIMEOUT_S", "5"))
+_CONNECT_TIMEOUT_S = float(os.getenv("IMAGE_FETCH_CONNECT_TIMEOUT_S", "1"))
+_MAX_BYTES = int(os.getenv("IMAGE_FETCH_MAX_BYTES", str(8 * 1024 * 1024)))
+_POOL_MAX_CONNECTIONS = int(os.getenv("IMAGE_FETCH_MAX_CONNECTIONS", "50"))
+# Image URLs come from clients; only local test setups should reach private hosts.
+_ALLOW_PRIVATE = os.getenv("IMAGE_FETCH_ALLOW_PRIVATE", "0").strip().lower() in {"1", "true", "yes"}
+
+_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+class _PublicOnlyBackend(httpcore.AsyncNetworkBackend):
+    # Resolves the host itself and connects to the address it validated, so a
+    # second DNS answer (rebinding) can never point the socket somewhere private.
+    # TLS SNI and the Host header still use the hostname. Runs for every new
+    # connection, redirects included; any non-public address for the host
+    # (loopback, link-local, private, reserved) rejects the fetch.
+    def __init__(self, backend: httpcore.AsyncNetworkBackend):
+        self._backend = backend
+
+    async def connect_tcp(self, host: str, port: int, timeout=None, local_address=None, socket_options=None):
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            raise ValueError(f"Cannot resolve image host {host}") from e
+        if not infos or not all(_is_public(info[4][0]) for info in infos):
+            raise ValueError(f"Image host {host} is not public")
+        return await self._backend.connect_tcp(
+            infos[0][4][0], port, timeout=timeout, local_address=local_address, socket_options=socket_options
+        )
+
+    async def connect_unix_socket(self, path: str, timeout=None, socket_options=None):
+        raise ValueError("Image fetches do not use unix sockets")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class _PublicOnlyTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # httpx does not take a network backend, so wrap the one its pool uses.
+        self._pool._network_backend = _PublicOnlyBackend(self._pool._network_backend)
+
+
+_limits = httpx.Limits(
+    max_connections=max(1, _POOL_MAX_CONNECTIONS),
+    max_keepalive_connections=max(1, _POOL_MAX_CONNECTIONS),
+)
+
+_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(_FETCH_TIMEOUT_S, connect=_CONNECT_TIMEOUT_S),
+    limits=_limits,
+    follow_redirects=True,
+    transport=None if _ALLOW_PRIVATE else _PublicOnlyTransport(limits=_limits),
+)
+
+
+async def aclose() -> None:
+    await _client.aclose()
+
+
+def _sniff_content_type(raw: bytes) -> str:
+    if raw[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if raw[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        return "image/webp"
+    if raw[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return ""
+
+
+async def fetch_image(url: str) -> tuple[bytes, str]:
+    async with _client.stream("GET", url) as res:
+        if res.status_code >= 400:
+            raise httpx.HTTPError(f"HTTP {res.status_code} fetching image")
+
+        chunks: list[bytes] = []
+        total = 0
+        async for chunk in res.aiter_bytes(chunk_size=65536):
+            chunks.append(chunk)
+            total += len(chunk)
+            if total > _MAX_BYTES:
+                raise ValueError(f"Image larger than {_MAX_BYTES} bytes")
+
+        raw = b"".join(chunks)
+        content_type = (res.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+    if content_type not in _IMAGE_TYPES:
+        content_type = _sniff_content_type(raw)
+    if not content_type:
+        raise ValueError("URL did not return a supported image")
+    return raw, content_type
+
+
+def to_data_url(raw: bytes, content_type: str) -> str:
+    return f"data:{content_type};base64,{base64.b64encode(raw).decode('ascii')}"
@@ -0,0 +1,80 @@
+import io
+import threading
+import time
+import weakref
+from typing import Any, Optional
+
+import numpy as np
+
+from app.core.metrics import CallbackMetric
+
+
+def dhash(raw: bytes) -> int:
+    # Difference hash: compare neighbouring pixels of a 9x8 grayscale thumbnail.
+    # Robust to re-encoding, resizing and small brightness changes.
+    try:
+        from PIL import Image
+    except Exception as e:
+        raise RuntimeError("Missing dependency: Pillow") from e
+
+    with Image.open(io.BytesIO(raw)) as img:
+        img.draft("L", (64, 64))
+        pixels = np.asarray(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+_caches: "weakref.WeakSet[PerceptualCache]" = weakref.WeakSet()
+
+
+for _field in ("hits", "misses"):
+    CallbackMetric(
+        f"dinacom_image_hash_cache_{_field}_total",
+        f"Perceptual image cache {_field}.",
+        "counter",
+        lambda field=_field: (({}, sum(c.stats()[field] for c in list(_caches))),),
+    )
+
+
+class PerceptualCache:
+    # 64-bit hashes in a ring buffer; lookup is one vectorized XOR + popcount.
+    def __init__(self, max_distance: int = 6, ttl: float = 1800, max_entries: int = 5000):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._hashes = np.zeros(self.max_entries, dtype=np.uint64)
+        self._expires = np.zeros(self.max_entries, dtype=np.float64)
+        self._values: list[Any] = [None] * self.max_entries
+        self._next = 0
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        _caches.add(self)
+
+    def get(self, image_hash: int) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            if self._size:
+                distances = np.bitwise_count(self._hashes[: self._size] ^ np.uint64(image_hash)).astype(np.int16)
+                distances[self._expires[: self._size] < now] = 65
+                index = int(np.argmin(distances))
+                if distances[index] <= self.max_distance:
+                    self.hits += 1
+                    return self._values[index]
+            self.misses += 1
+            return None
+
+    def set(self, image_hash: int, value: Any) -> None:
+        with self._lock:
+            index = self._next
+            self._hashes[index] = np.uint64(image_hash)
+            self._expires[index] = time.monotonic() + self.ttl
+            self._values[index] = value
+            self._next = (index + 1) % self.max_entries
+            self._size = max(self._size, index + 1)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": self._size}
@@ -1,26 +1,405 @@
+import asyncio
+import json
+import os
+import sys
 import time
-from typing import Any
 import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 
-class TTLCache:
-    def __init__(self, ttl: int = 300):
-        self.ttl = ttl
-        self.store: dict[str, tuple[float, Any]] = {}
-        self._lock = threading.RLock()
-        
+from app.core.metrics import CallbackMetric
+
+_DEFAULT_MAX_ENTRIES = int(os.getenv("CACHE_DEFAULT_MAX_ENTRIES", "10000"))
+_DEFAULT_MAX_BYTES = int(os.getenv("CACHE_DEFAULT_MAX_BYTES", str(64 * 1024 * 1024)))
+_DEFAULT_SHARDS = int(os.getenv("CACHE_SHARDS", "16"))
+_SWEEP_INTERVAL_S = float(os.getenv("CACHE_SWEEP_INTERVAL_S", "60"))
+
+_BACKEND = os.getenv("CACHE_BACKEND", "memory").strip().lower() or "memory"
+_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+_REDIS_PREFIX = os.getenv("CACHE_REDIS_PREFIX", "dinacom")
+_REDIS_TIMEOUT_S = float(os.getenv("CACHE_REDIS_TIMEOUT_S", "0.1"))
+# After an error Redis is skipped for this long so an outage costs no timeouts.
+_REDIS_OPEN_S = float(os.getenv("CACHE_REDIS_OPEN_S", "5"))
+_REDIS_WRITERS = int(os.getenv("CACHE_REDIS_WRITERS", "2"))
+_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+
+
+def _estimate_size(value: Any) -> int:
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def dumps(value: Any) -> bytes:
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(raw) >= _COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return b"z" + packed
+    return b"j" + raw
+
+
+def loads(data: bytes) -> Any:
+    if data[:1] == b"z":
+        return json.loads(zlib.decompress(data[1:]))
+    return json.loads(data[1:])
+
+
+class CacheBackend:
     def get(self, key: str):
-        with self._lock:
-            data = self.store.get(key)
+        raise NotImplementedError
+
+    def get_many(self, keys: list[str]) -> list:
+        return [self.get(k) for k in keys]
+
+    async def aget_many(self, keys: list[str]) -> list:
+        return self.get_many(keys)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+class _Shard:
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store: OrderedDict[str, tuple[float, float, int, Any]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.last_sweep = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _remove(self, key: str) -> None:
+        _, _, size, _ = self.store.pop(key)
+        self.bytes -= size
+
+    def sweep(self, now: float) -> None:
+        self.last_sweep = now
+        expired = [k for k, (expires, _, _, _) in self.store.items() if now > expires]
+        for k in expired:
+            self._remove(k)
+        self.expirations += len(expired)
+
+    def evict(self) -> None:
+        while self.store and (len(self.store) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, _, size, _) = self.store.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+
+class MemoryBackend(CacheBackend):
+    # Sharded so an expiry sweep or eviction holds one shard's lock, not the whole
+    # cache's; under the GIL it does not raise throughput (see bench_cache).
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        shards: int | None = None,
+        sweep_interval_s: float = _SWEEP_INTERVAL_S,
+    ):
+        self.max_entries = max(1, max_entries if max_entries is not None else _DEFAULT_MAX_ENTRIES)
+        self.max_bytes = max(1, max_bytes if max_bytes is not None else _DEFAULT_MAX_BYTES)
+
+        n = max(1, shards if shards is not None else _DEFAULT_SHARDS)
+        n = min(n, self.max_entries, self.max_bytes)
+        # The remainder goes to the first shards so the totals match the limits exactly.
+        self._shards = [
+            _Shard(
+                self.max_entries // n + (i < self.max_entries % n),
+                self.max_bytes // n + (i < self.max_bytes % n),
+            )
+            for i in range(n)
+        ]
+        self._sweep_interval_s = max(0.0, sweep_interval_s)
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: str):
+        shard = self._shard(key)
+        now = time.monotonic()
+        with shard.lock:
+            if now - shard.last_sweep > self._sweep_interval_s:
+                shard.sweep(now)
+
+            data = shard.store.get(key)
             if not data:
+                shard.misses += 1
                 return None
 
-            timestamp, value = data
-            if time.time() - timestamp > self.ttl:
-                self.store.pop(key, None)
+            expires, _, _, value = data
+            if now > expires:
+                shard._remove(key)
+                shard.expirations += 1
+                shard.misses += 1
                 return None
 
+            shard.store.move_to_end(key)
+            shard.hits += 1
             return value
-    
-    def set(self, key: str, value: Any):
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        shard = self._shard(key)
+        size = _estimate_size(key) + _estimate_size(value)
+        now = time.monotonic()
+        with shard.lock:
+            if now - shard.last_sweep > self._sweep_interval_s:
+                shard.sweep(now)
+
+            if key in shard.store:
+                shard._remove(key)
+
+            if size > shard.max_bytes:
+                shard.evictions += 1
+                return
+
+            shard.store[key] = (now + ttl, now, size, value)
+            shard.bytes += size
+            shard.evict()
+
+    def __len__(self) -> int:
+        return sum(len(s.store) for s in self._shards)
+
+    def stats(self) -> dict[str, int]:
+        totals = {"entries": 0, "bytes": 0, "hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        for s in self._shards:
+            with s.lock:
+                totals["entries"] += len(s.store)
+                totals["bytes"] += s.bytes
+                totals["hits"] += s.hits
+                totals["misses"] += s.misses
+                totals["evictions"] += s.evictions
+                totals["expirations"] += s.expirations
+        return totals
+
+
+_redis_clients: dict[tuple[str, float], Any] = {}
+_redis_lock = threading.Lock()
+_redis_writer: ThreadPoolExecutor | None = None
+
+
+def _redis_client(url: str, timeout_s: float = _REDIS_TIMEOUT_S):
+    # One client per (URL, timeout); callers with different latency budgets get their own.
+    with _redis_lock:
+        client = _redis_clients.get((url, timeout_s))
+        if client is None:
+            try:
+                import redis
+            except Exception as e:
+                raise RuntimeError("Missing dependency: redis") from e
+
+            client = redis.Redis.from_url(
+                url,
+                socket_timeout=timeout_s,
+                socket_connect_timeout=timeout_s,
+            )
+            _redis_clients[(url, timeout_s)] = client
+        return client
+
+
+def _writer() -> ThreadPoolExecutor:
+    global _redis_writer
+    with _redis_lock:
+        if _redis_writer is None:
+            _redis_writer = ThreadPoolExecutor(max_workers=max(1, _REDIS_WRITERS), thread_name_prefix="cache-redis")
+        return _redis_writer
+
+
+class RedisBackend(CacheBackend):
+    # Errors are counted and treated as misses so a Redis outage degrades to
+    # recomputation. The client is synchronous: reads from the event loop go
+    # through aget_many (a worker thread) and writes are queued on a writer pool.
+    def __init__(self, namespace: str, url: str = _REDIS_URL, client=None, open_s: float = _REDIS_OPEN_S):
+        self.prefix = f"{_REDIS_PREFIX}:{namespace}:"
+        self.client = client if client is not None else _redis_client(url)
+        self.open_s = open_s
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    def _count(self, hits: int = 0, misses: int = 0, errors: int = 0) -> None:
         with self._lock:
-            self.store[key] = (time.time(), value)
\ No newline at end of file
+            self.hits += hits
+            self.misses += misses
+            self.errors += errors
+            if errors:
+                self._open_until = time.monotonic() + self.open_s
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._open_until
+
+    def get(self, key: str):
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: list[str]) -> list:
+        if not keys:
+            return []
+        if not self._available():
+            self._count(misses=len(keys))
+            return [None] * len(keys)
+        try:
+            raw = self.client.mget([self.prefix + k for k in keys])
+        except Exception:
+            self._count(misses=len(keys), errors=1)
+            return [None] * len(keys)
+
+        values = []
+        for data in raw:
+            value = None
+            if data:
+                try:
+                    value = loads(data)
+                except Exception:
+                    self._count(errors=1)
+            values.append(value)
+
+        hits = sum(1 for v in values if v is not None)
+        self._count(hits=hits, misses=len(values) - hits)
+        return values
+
+    async def aget_many(self, keys: list[str]) -> list:
+        if not keys or not self._available():
+            return self.get_many(keys)
+        return await asyncio.to_thread(self.get_many, keys)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if self._available():
+            _writer().submit(self._write, key, value, ttl)
+
+    def _write(self, key: str, value: Any, ttl: float) -> None:
+        if not self._available():
+            return
+        try:
+            self.client.set(self.prefix + key, dumps(value), px=max(1, int(ttl * 1000)))
+        except Exception:
+            self._count(errors=1)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+_caches: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+
+
+def _cache_samples(field: str):
+    for cache in list(_caches):
+        stats = cache.stats()
+        if field == "hit_ratio":
+            lookups = stats["hits"] + stats["misses"]
+            yield {"cache": cache.namespace or "unnamed"}, (stats["hits"] / lookups) if lookups else 0.0
+        elif field in stats:
+            yield {"cache": cache.namespace or "unnamed"}, stats[field]
+
+
+for _field, _type in (
+    ("hits", "counter"),
+    ("misses", "counter"),
+    ("evictions", "counter"),
+    ("expirations", "counter"),
+    ("remote_hits", "counter"),
+    ("remote_misses", "counter"),
+    ("remote_errors", "counter"),
+    ("entries", "gauge"),
+    ("bytes", "gauge"),
+    ("hit_ratio", "gauge"),
+):
+    CallbackMetric(
+        f"dinacom_cache_{_field}" + ("_total" if _type == "counter" else ""),
+        f"TTLCache {_field.replace('_', ' ')} per cache namespace.",
+        _type,
+        lambda field=_field: _cache_samples(field),
+    )
+
+
+class TTLCache:
+    def __init__(
+        self,
+        ttl: int = 300,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        shards: int | None = None,
+        namespace: str | None = None,
+        remote: CacheBackend | None = None,
+    ):
+        self.ttl = ttl
+        self.namespace = namespace
+        self._local = MemoryBackend(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            shards=shards,
+            sweep_interval_s=min(float(ttl), _SWEEP_INTERVAL_S),
+        )
+
+        # Shared caches need a namespace so different caches never collide in Redis.
+        if remote is None and namespace and _BACKEND == "redis":
+            remote = RedisBackend(namespace)
+        self._remote = remote
+        _caches.add(self)
+
+    def get(self, key: str):
+        value = self._local.get(key)
+        if value is not None or self._remote is None:
+            return value
+
+        value = self._remote.get(key)
+        if value is not None:
+            self._local.set(key, value, self.ttl)
+        return value
+
+    def get_many(self, keys: list[str]) -> list:
+        values = [self._local.get(k) for k in keys]
+        if self._remote is None:
+            return values
+
+        missing = [i for i, v in enumerate(values) if v is None]
+        if missing:
+            self._fill(keys, values, missing, self._remote.get_many([keys[i] for i in missing]))
+        return values
+
+    async def aget(self, key: str):
+        return (await self.aget_many([key]))[0]
+
+    async def aget_many(self, keys: list[str]) -> list:
+        # Same as get_many, but a remote lookup does not block the event loop.
+        values = [self._local.get(k) for k in keys]
+        if self._remote is None:
+            return values
+
+        missing = [i for i, v in enumerate(values) if v is None]
+        if missing:
+            self._fill(keys, values, missing, await self._remote.aget_many([keys[i] for i in missing]))
+        return values
+
+    def _fill(self, keys: list[str], values: list, missing: list[int], fetched: list) -> None:
+        for i, value in zip(missing, fetched):
+            if value is not None:
+                values[i] = value
+                self._local.set(keys[i], value, self.ttl)
+
+    def set(self, key: str, value: Any):
+        self._local.set(key, value, self.ttl)
+        if self._remote is not None:
+            self._remote.set(key, value, self.ttl)
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+    def stats(self) -> dict[str, int]:
+        stats = self._local.stats()
+        if self._remote is not None:
+            stats.update({f"remote_{k}": v for k, v in self._remote.stats().items()})
+        return stats
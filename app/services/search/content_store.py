@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+_STORE_PATH = os.getenv("SEARCH_CONTENT_STORE_PATH", "").strip()
+_FRESH_S = float(os.getenv("SEARCH_CONTENT_STORE_FRESH_S", str(60 * 60 * 6)))
+_MAX_AGE_S = float(os.getenv("SEARCH_CONTENT_STORE_MAX_AGE_S", str(60 * 60 * 24 * 7)))
+
+
+class ContentStore:
+    def __init__(self, path: str, fresh_s: float = _FRESH_S, max_age_s: float = _MAX_AGE_S):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.fresh_s = fresh_s
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched_at REAL NOT NULL,"
+            " checked_at REAL NOT NULL)"
+        )
+        self.prune()
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, etag, last_modified, fetched_at, checked_at FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+
+        text, etag, last_modified, fetched_at, checked_at = row
+        return {
+            "text": text,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": fetched_at,
+            "checked_at": checked_at,
+        }
+
+    def is_fresh(self, page: dict) -> bool:
+        return time.time() - page["checked_at"] < self.fresh_s
+
+    def put(self, url: str, text: str, etag: str | None = None, last_modified: str | None = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, text, etag, last_modified, fetched_at, checked_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, text, etag, last_modified, now, now),
+            )
+
+    def touch(self, url: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE pages SET checked_at = ? WHERE url = ?", (time.time(), url))
+
+    def prune(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE checked_at < ?", (time.time() - self.max_age_s,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+content_store = ContentStore(_STORE_PATH) if _STORE_PATH else None
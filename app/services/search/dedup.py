@@ -0,0 +1,109 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.core.metrics import CallbackMetric
+
+_SHINGLE_WORDS = int(os.getenv("SEARCH_DEDUP_SHINGLE_WORDS", "4"))
+_MAX_CHARS = int(os.getenv("SEARCH_DEDUP_MAX_CHARS", "20000"))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def simhash(text: str, shingle_words: int = _SHINGLE_WORDS) -> int:
+    # 64-bit SimHash over word shingles: each bit is a majority vote of the
+    # shingle hashes, so texts sharing most shingles differ in only a few bits.
+    words = _TOKEN_RE.findall((text or "")[:_MAX_CHARS].lower())
+    if not words:
+        return 0
+    n = max(1, len(words) - shingle_words + 1)
+    shingles = (" ".join(words[i:i + shingle_words]) for i in range(n))
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(n, 8), axis=1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - n
+    return int(np.packbits(votes > 0).view(">u8")[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+_indexes: "weakref.WeakSet[NearDuplicateIndex]" = weakref.WeakSet()
+
+
+CallbackMetric(
+    "dinacom_search_duplicates_total",
+    "Extracted pages found to be near-duplicates of an already indexed page.",
+    "counter",
+    lambda: (({}, sum(i.stats()["duplicates"] for i in list(_indexes))),),
+)
+
+
+class NearDuplicateIndex:
+    # Page fingerprints in a ring buffer (one XOR + popcount per lookup), plus
+    # which URLs turned out to repeat another URL's content.
+    def __init__(self, max_distance: int = 3, ttl: float = 60 * 60 * 6, max_entries: int = 5000):
+        self.max_distance = max_distance
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._hashes = np.zeros(self.max_entries, dtype=np.uint64)
+        self._expires = np.zeros(self.max_entries, dtype=np.float64)
+        self._urls: list[Optional[str]] = [None] * self.max_entries
+        self._next = 0
+        self._size = 0
+        self._aliases: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self.duplicates = 0
+        self._lock = threading.Lock()
+        _indexes.add(self)
+
+    def canonical(self, url: str) -> str:
+        with self._lock:
+            alias = self._aliases.get(url)
+            if alias is None:
+                return url
+            if alias[1] < time.monotonic():
+                del self._aliases[url]
+                return url
+            return alias[0]
+
+    def add(self, url: str, text: str) -> str:
+        # Returns the URL whose content this text repeats, or url itself.
+        fingerprint = np.uint64(simhash(text))
+        now = time.monotonic()
+        with self._lock:
+            if self._size:
+                distances = np.bitwise_count(self._hashes[: self._size] ^ fingerprint).astype(np.int16)
+                distances[self._expires[: self._size] < now] = 65
+                index = int(np.argmin(distances))
+                if distances[index] <= self.max_distance and self._urls[index] == url:
+                    self._hashes[index] = fingerprint
+                    self._expires[index] = now + self.ttl
+                    return url
+                if distances[index] <= self.max_distance:
+                    canonical = self._urls[index]
+                    self._aliases[url] = (canonical, self._expires[index])
+                    self._aliases.move_to_end(url)
+                    while len(self._aliases) > self.max_entries:
+                        self._aliases.popitem(last=False)
+                    self.duplicates += 1
+                    return canonical
+
+            index = self._next
+            self._hashes[index] = fingerprint
+            self._expires[index] = now + self.ttl
+            self._urls[index] = url
+            self._next = (index + 1) % self.max_entries
+            self._size = max(self._size, index + 1)
+            return url
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"duplicates": self.duplicates, "entries": self._size, "aliases": len(self._aliases)}
@@ -0,0 +1,75 @@
+import os
+
+from app.services.search.domain_stats import DomainStats, domain_of, domain_stats
+
+# Suffix matches: "go.id" covers every government domain.
+_ALLOW = os.getenv(
+    "SEARCH_DOMAIN_ALLOW",
+    "go.id,ac.id,who.int,unicef.org,nih.gov,cdc.gov,alodokter.com,halodoc.com,hellosehat.com,"
+    "klikdokter.com,siloamhospitals.com,mayapadahospital.com,primayahospital.com",
+)
+_DENY = os.getenv(
+    "SEARCH_DOMAIN_DENY",
+    "facebook.com,instagram.com,tiktok.com,twitter.com,x.com,youtube.com,pinterest.com,"
+    "scribd.com,quora.com,reddit.com,kaskus.co.id",
+)
+_ALLOW_PRIOR = float(os.getenv("SEARCH_DOMAIN_ALLOW_PRIOR", "0.9"))
+_DEFAULT_PRIOR = float(os.getenv("SEARCH_DOMAIN_DEFAULT_PRIOR", "0.6"))
+# How much one step down the search ranking costs, in usable-content probability.
+_POSITION_WEIGHT = float(os.getenv("SEARCH_DOMAIN_POSITION_WEIGHT", "0.05"))
+_SLOW_PENALTY = float(os.getenv("SEARCH_DOMAIN_SLOW_PENALTY", "0.3"))
+
+
+def _domains(value: str) -> tuple[str, ...]:
+    return tuple(d.strip().lower().lstrip(".") for d in value.split(",") if d.strip())
+
+
+def _matches(domain: str, suffixes: tuple[str, ...]) -> bool:
+    return any(domain == s or domain.endswith("." + s) for s in suffixes)
+
+
+class DomainPolicy:
+    # Orders candidate URLs by the chance their domain yields usable content:
+    # a prior from the allow-list, blended with the rate learned in DomainStats
+    # as samples accumulate, minus a small cost per search-rank position.
+    def __init__(
+        self,
+        allow: str = _ALLOW,
+        deny: str = _DENY,
+        stats: DomainStats = domain_stats,
+        allow_prior: float = _ALLOW_PRIOR,
+        default_prior: float = _DEFAULT_PRIOR,
+        position_weight: float = _POSITION_WEIGHT,
+        slow_penalty: float = _SLOW_PENALTY,
+    ):
+        self.allow = _domains(allow)
+        self.deny = _domains(deny)
+        self.stats = stats
+        self.allow_prior = allow_prior
+        self.default_prior = default_prior
+        self.position_weight = position_weight
+        self.slow_penalty = slow_penalty
+
+    def allowed(self, url: str) -> bool:
+        return not _matches(domain_of(url), self.deny)
+
+    def usable_rate(self, url: str) -> float:
+        prior = self.allow_prior if _matches(domain_of(url), self.allow) else self.default_prior
+        learned = self.stats.get(url)
+        if learned is None:
+            return prior
+        weight = min(1.0, learned["samples"] / self.stats.min_samples)
+        return weight * learned["success"] + (1 - weight) * prior
+
+    def score(self, url: str, position: int) -> float:
+        score = self.usable_rate(url) - self.position_weight * position
+        if self.stats.is_poor(url):
+            score -= self.slow_penalty
+        return score
+
+    def rank(self, urls: list[str]) -> list[str]:
+        candidates = [(self.score(url, i), i, url) for i, url in enumerate(urls) if self.allowed(url)]
+        return [url for _, _, url in sorted(candidates, key=lambda c: (-c[0], c[1]))]
+
+
+domain_policy = DomainPolicy()
@@ -0,0 +1,80 @@
+import math
+import os
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+_ALPHA = float(os.getenv("SEARCH_DOMAIN_EWMA_ALPHA", "0.2"))
+_MIN_SAMPLES = int(os.getenv("SEARCH_DOMAIN_MIN_SAMPLES", "5"))
+_MIN_SUCCESS = float(os.getenv("SEARCH_DOMAIN_MIN_SUCCESS", "0.2"))
+_SLOW_S = float(os.getenv("SEARCH_DOMAIN_SLOW_S", "1.5"))
+_MAX_DOMAINS = int(os.getenv("SEARCH_DOMAIN_MAX_ENTRIES", "5000"))
+_HEDGE_DEFAULT_S = float(os.getenv("SEARCH_HEDGE_DEFAULT_S", "1.0"))
+_HEDGE_MIN_S = float(os.getenv("SEARCH_HEDGE_MIN_S", "0.2"))
+# z-score of the latency percentile used as hedge delay; 1.28 is roughly p90.
+_HEDGE_Z = float(os.getenv("SEARCH_HEDGE_Z", "1.28"))
+
+
+def domain_of(url: str) -> str:
+    host = (urlsplit(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class DomainStats:
+    # Exponentially weighted latency mean/variance and usable-content rate per
+    # domain. Only touched from the event loop, so there is no lock.
+    def __init__(
+        self,
+        alpha: float = _ALPHA,
+        min_samples: int = _MIN_SAMPLES,
+        min_success: float = _MIN_SUCCESS,
+        slow_s: float = _SLOW_S,
+        max_domains: int = _MAX_DOMAINS,
+    ):
+        self.alpha = alpha
+        self.min_samples = max(1, min_samples)
+        self.min_success = min_success
+        self.slow_s = slow_s
+        self.max_domains = max(1, max_domains)
+        self._domains: "OrderedDict[str, list[float]]" = OrderedDict()
+
+    def observe(self, url: str, latency_s: float, ok: bool) -> None:
+        domain = domain_of(url)
+        state = self._domains.get(domain)
+        if state is None:
+            # samples, mean_s, variance, success rate
+            state = [0, latency_s, 0.0, 1.0 if ok else 0.0]
+            self._domains[domain] = state
+            while len(self._domains) > self.max_domains:
+                self._domains.popitem(last=False)
+        else:
+            diff = latency_s - state[1]
+            state[1] += self.alpha * diff
+            state[2] = (1 - self.alpha) * (state[2] + self.alpha * diff * diff)
+            state[3] += self.alpha * ((1.0 if ok else 0.0) - state[3])
+            self._domains.move_to_end(domain)
+        state[0] += 1
+
+    def get(self, url: str) -> dict | None:
+        state = self._domains.get(domain_of(url))
+        if state is None:
+            return None
+        samples, mean_s, variance, success = state
+        return {"samples": int(samples), "latency_s": mean_s, "latency_std_s": math.sqrt(variance), "success": success}
+
+    def hedge_delay_s(self, url: str, max_s: float) -> float:
+        # How long to wait on this URL before starting the next candidate; never
+        # longer than what counts as a slow domain.
+        stats = self.get(url)
+        if stats is None:
+            return min(max_s, _HEDGE_DEFAULT_S)
+        delay = stats["latency_s"] + _HEDGE_Z * stats["latency_std_s"]
+        return min(max_s, self.slow_s, max(_HEDGE_MIN_S, delay))
+
+    def is_poor(self, url: str) -> bool:
+        stats = self.get(url)
+        if stats is None or stats["samples"] < self.min_samples:
+            return False
+        return stats["success"] < self.min_success or stats["latency_s"] > self.slow_s
+
+
+domain_stats = DomainStats()
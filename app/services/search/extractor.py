@@ -1,10 +1,15 @@
+import asyncio
+import codecs
 import os
-import requests
+import re
+import httpx
 import io
+import itertools
 from bs4 import BeautifulSoup
 from bs4 import FeatureNotFound
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from app.services.search import parse_pool
+from app.services.search.cache import TTLCache
 
 _EXTRACT_TIMEOUT_S = float(os.getenv("SEARCH_EXTRACT_TIMEOUT_S", "6"))
 _CONNECT_TIMEOUT_S = float(os.getenv("SEARCH_EXTRACT_CONNECT_TIMEOUT_S", "1"))
@@ -17,28 +22,39 @@ _RETRY_BACKOFF = float(os.getenv("SEARCH_EXTRACT_RETRY_BACKOFF", "0.2"))
 
 _PREFERRED_PARSER = os.getenv("SEARCH_EXTRACT_BS_PARSER", "lxml").strip() or "lxml"
 _PDF_MAX_PAGES = int(os.getenv("SEARCH_EXTRACT_PDF_MAX_PAGES", "12"))
+# HTML is parsed while it downloads and both stop once this much text is collected.
+_MAX_TEXT_CHARS = int(os.getenv("SEARCH_EXTRACT_MAX_TEXT_CHARS", "20000"))
+_STREAMING = os.getenv("SEARCH_EXTRACT_STREAMING", "1") == "1"
+# Larger PDFs served with Accept-Ranges are read with Range requests instead of in full.
+_PDF_RANGE_MIN_BYTES = int(os.getenv("SEARCH_EXTRACT_PDF_RANGE_MIN_BYTES", "1000000"))
+_PDF_RANGE_BLOCK = max(4096, int(os.getenv("SEARCH_EXTRACT_PDF_RANGE_BLOCK", "65536")))
+_PDF_RANGE_MAX_ROUNDS = int(os.getenv("SEARCH_EXTRACT_PDF_RANGE_MAX_ROUNDS", "16"))
 
-_session = requests.Session()
-_retries = Retry(
-    total=max(0, _RETRY_TOTAL),
-    connect=max(0, _RETRY_TOTAL),
-    read=max(0, _RETRY_TOTAL),
-    status=max(0, _RETRY_TOTAL),
-    backoff_factor=max(0.0, _RETRY_BACKOFF),
-    status_forcelist=(429, 500, 502, 503, 504),
-    allowed_methods=frozenset(["GET"]),
-    raise_on_status=False,
-    respect_retry_after_header=True,
-)
-_adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=_retries)
-_session.mount("http://", _adapter)
-_session.mount("https://", _adapter)
+_SKIP_TAGS = frozenset(["script", "style", "noscript", "header", "footer", "nav", "aside", "iframe", "svg", "template"])
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.I)
+_BOMS = ((codecs.BOM_UTF8, "utf-8"), (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_POOL_MAX_CONNECTIONS = int(os.getenv("SEARCH_EXTRACT_MAX_CONNECTIONS", "100"))
 
 _proxy = os.getenv("SEARCH_PROXY")
 _http_proxy = os.getenv("SEARCH_HTTP_PROXY") or _proxy
 _https_proxy = os.getenv("SEARCH_HTTPS_PROXY") or _proxy
-if _http_proxy or _https_proxy:
-    _session.proxies.update({k: v for k, v in {"http": _http_proxy, "https": _https_proxy}.items() if v})
+
+
+def _proxies() -> dict[str, str]:
+    return {f"{scheme}://": url for scheme, url in {"http": _http_proxy, "https": _https_proxy}.items() if url}
+
+
+_mounts = {key: httpx.AsyncHTTPTransport(proxy=proxy) for key, proxy in _proxies().items()}
+
+# Extracted text per (URL, page), so a later request reuses pages already parsed.
+pdf_page_cache = TTLCache(
+    ttl=int(os.getenv("SEARCH_PDF_PAGE_CACHE_TTL_S", str(60 * 60 * 24))),
+    namespace="search:pdf_page",
+    max_entries=int(os.getenv("SEARCH_PDF_PAGE_CACHE_MAX_ENTRIES", "20000")),
+)
 
 
 def _default_headers() -> dict[str, str]:
@@ -50,45 +66,106 @@ def _default_headers() -> dict[str, str]:
     }
 
 
-def _compute_timeout():
-    timeout = (_CONNECT_TIMEOUT_S, _READ_TIMEOUT_S)
+def _compute_timeout() -> httpx.Timeout:
     if _EXTRACT_TIMEOUT_S > 0 and _EXTRACT_TIMEOUT_S < (_CONNECT_TIMEOUT_S + _READ_TIMEOUT_S):
-        timeout = _EXTRACT_TIMEOUT_S
-    return timeout
+        return httpx.Timeout(_EXTRACT_TIMEOUT_S)
+    return httpx.Timeout(_READ_TIMEOUT_S, connect=_CONNECT_TIMEOUT_S)
 
 
-def _download_bytes(url: str) -> tuple[bytes, str]:
-    res = _session.get(
-        url,
-        timeout=_compute_timeout(),
-        headers=_default_headers(),
-        stream=True,
-    )
+_client = httpx.AsyncClient(
+    timeout=_compute_timeout(),
+    limits=httpx.Limits(
+        max_connections=max(1, _POOL_MAX_CONNECTIONS),
+        max_keepalive_connections=max(1, _POOL_MAX_CONNECTIONS),
+    ),
+    follow_redirects=True,
+    mounts=_mounts or None,
+)
 
-    if res.status_code >= 400:
-        reason = (res.reason or "").strip()
-        extra = f" {reason}" if reason else ""
-        raise requests.HTTPError(f"HTTP {res.status_code}{extra}")
 
-    chunks: list[bytes] = []
-    total = 0
-    for chunk in res.iter_content(chunk_size=65536):
-        if not chunk:
-            continue
-        chunks.append(chunk)
-        total += len(chunk)
-        if total >= _MAX_BYTES:
-            break
+async def aclose() -> None:
+    await _client.aclose()
 
-    raw = b"".join(chunks)
-    content_type = (res.headers.get("Content-Type") or "").split(";")[0].strip().lower()
-    return raw, content_type
 
+def _retry_delay(attempt: int, res: httpx.Response | None = None) -> float:
+    delay = max(0.0, _RETRY_BACKOFF) * (2 ** attempt)
+    retry_after = (res.headers.get("Retry-After") or "").strip() if res is not None else ""
+    if retry_after.isdigit():
+        delay = max(delay, float(retry_after))
+    return delay
+
+
+def _response_validators(res: httpx.Response, not_modified: bool = False) -> dict:
+    return {
+        "not_modified": not_modified,
+        "etag": res.headers.get("ETag"),
+        "last_modified": res.headers.get("Last-Modified"),
+    }
+
+
+async def _download(url: str, validators: dict | None, read) -> tuple[object, dict]:
+    # `read` consumes a successful response; it runs again from scratch on retry.
+    headers = _default_headers()
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    attempts = max(0, _RETRY_TOTAL) + 1
+    for attempt in range(attempts):
+        try:
+            async with _client.stream("GET", url, headers=headers) as res:
+                if res.status_code in _RETRY_STATUS and attempt + 1 < attempts:
+                    delay = _retry_delay(attempt, res)
+                elif res.status_code == 304 and validators:
+                    return None, _response_validators(res, not_modified=True)
+                else:
+                    if res.status_code >= 400:
+                        reason = (res.reason_phrase or "").strip()
+                        extra = f" {reason}" if reason else ""
+                        raise httpx.HTTPError(f"HTTP {res.status_code}{extra}")
+                    return await read(res), _response_validators(res)
+        except httpx.TransportError:
+            if attempt + 1 >= attempts:
+                raise
+            delay = _retry_delay(attempt)
+
+        await asyncio.sleep(delay)
 
-def _download_html(url: str) -> str:
-    
-    raw, _ = _download_bytes(url)
-    return raw.decode("utf-8", errors="ignore")
+    raise httpx.HTTPError(f"Failed to download {url}")
+
+
+def _content_type(res: httpx.Response) -> str:
+    return (res.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+
+def _valid_charset(name: str) -> str | None:
+    try:
+        name = codecs.lookup(name).name
+    except LookupError:
+        return None
+    # Pages labelled latin-1 are nearly always windows-1252, as browsers assume.
+    return "cp1252" if name in ("latin_1", "iso8859-1") else name
+
+
+def _charset(content_type_header: str, head: bytes) -> str:
+    # Content-Type charset, then a BOM, then <meta charset>, then UTF-8.
+    for param in content_type_header.split(";")[1:]:
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "charset":
+            charset = _valid_charset(value.strip().strip("\"'"))
+            if charset:
+                return charset
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            return name
+    match = _META_CHARSET_RE.search(head[:4096])
+    if match:
+        charset = _valid_charset(match.group(1).decode("ascii", errors="ignore"))
+        if charset:
+            return charset
+    return "utf-8"
 
 
 def _is_probably_pdf(url: str, content_type: str, raw: bytes) -> bool:
@@ -99,49 +176,355 @@ def _is_probably_pdf(url: str, content_type: str, raw: bytes) -> bool:
     return raw[:5] == b"%PDF-"
 
 
-def _extract_pdf_text(raw: bytes) -> str:
+class _MissingBlocks(BaseException):
+    # BaseException so pypdf's and our own `except Exception` fallbacks let it through.
+    def __init__(self, first: int, last: int):
+        super().__init__(first, last)
+        self.first = first
+        self.last = last
+
+
+class _BlockFile(io.RawIOBase):
+    # Seekable view of a remote file for PdfReader over the blocks fetched so
+    # far. Parse workers never touch the network: a read of a missing block
+    # raises _MissingBlocks, the event loop fetches it and the parse reruns.
+    def __init__(self, blocks: dict[int, bytes], size: int, block: int = _PDF_RANGE_BLOCK):
+        self.blocks = blocks
+        self.size = size
+        self.block = block
+        self.pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def readinto(self, buffer) -> int:
+        n = min(len(buffer), self.size - self.pos)
+        if n <= 0:
+            return 0
+        first, last = self.pos // self.block, (self.pos + n - 1) // self.block
+        missing = [index for index in range(first, last + 1) if index not in self.blocks]
+        if missing:
+            raise _MissingBlocks(missing[0], missing[-1])
+        data = b"".join(self.blocks[index] for index in range(first, last + 1))
+        offset = self.pos - first * self.block
+        buffer[:n] = data[offset:offset + n]
+        self.pos += n
+        return n
+
+
+def _pdf_source(source):
+    # Raw bytes, or (blocks, size) for a file read with Range requests.
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    blocks, size = source
+    return io.BufferedReader(_BlockFile(blocks, size), buffer_size=_PDF_RANGE_BLOCK)
+
+
+_INHERITED_PAGE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+def _iter_pdf_pages(reader):
+    # reader.pages resolves every page object on first access; walking the tree
+    # lazily means the first pages of a large file read over Range requests only
+    # touch the blocks they live in.
+    from pypdf import PageObject
+    from pypdf.generic import IndirectObject, NameObject
+
+    stack = [(iter([reader.trailer["/Root"]["/Pages"]]), {})]
+    seen: set[int] = set()
+    while stack:
+        kids, inherited = stack[-1]
+        ref = next(kids, None)
+        if ref is None:
+            stack.pop()
+            continue
+        node = ref.get_object()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if "/Kids" in node:
+            if len(stack) < 64:
+                inherit = dict(inherited)
+                inherit.update({key: node[key] for key in _INHERITED_PAGE_KEYS if key in node})
+                stack.append((iter(node["/Kids"]), inherit))
+            continue
+        page = PageObject(reader, ref if isinstance(ref, IndirectObject) else None)
+        page.update(node)
+        for key, value in inherited.items():
+            if key not in page:
+                page[NameObject(key)] = value
+        yield page
+
+
+def _extract_pdf_pages(source, start: int = 0, max_pages: int = _PDF_MAX_PAGES, max_chars: int = _MAX_TEXT_CHARS) -> list[str]:
+    # Text of pages start.. in order, stopping once max_chars is collected;
+    # an empty string marks a page without extractable text.
     try:
         from pypdf import PdfReader
     except Exception as e:  
         raise RuntimeError("Missing dependency: pypdf") from e
 
-    reader = PdfReader(io.BytesIO(raw))
+    stream = _pdf_source(source)
+    reader = None
+    if not isinstance(source, (bytes, bytearray)):
+        # Non-strict loading checks every xref entry, touching the whole file;
+        # strict loading only reads what pages need. Malformed files fall back.
+        try:
+            reader = PdfReader(stream, strict=True)
+        except Exception:
+            reader = None
+    if reader is None:
+        reader = PdfReader(stream)
     texts: list[str] = []
-    max_pages = max(1, _PDF_MAX_PAGES)
-    for i, page in enumerate(reader.pages[:max_pages]):
+    total = 0
+    for page in itertools.islice(_iter_pdf_pages(reader), start, max(1, max_pages)):
         try:
             t = page.extract_text() or ""
         except Exception:
             t = ""
-        if t:
-            texts.append(t)
+        t = " ".join(t.split())
+        texts.append(t)
+        total += len(t)
+        if total >= max_chars:
+            break
+    return texts
 
-    text = "\n".join(texts)
-    text = " ".join(text.split())
+
+def _join_pages(texts: list[str]) -> str:
+    text = " ".join(t for t in texts if t)
     if not text:
         raise ValueError("PDF has no extractable text")
     return text
 
-def extract_web_content(url: str) -> str:
+
+def _extract_pdf_text(raw: bytes) -> str:
+    return _join_pages(_extract_pdf_pages(raw))
+
+
+async def _cached_pdf_pages(url: str) -> list[str]:
+    # Leading pages already extracted for url, stopping at the first gap.
+    keys = [f"{url}#{index}" for index in range(max(1, _PDF_MAX_PAGES))]
+    pages: list[str] = []
+    for text in await pdf_page_cache.aget_many(keys):
+        if text is None:
+            break
+        pages.append(text)
+    return pages
+
+
+def _pdf_cache_satisfies(pages: list[str]) -> bool:
+    return len(pages) >= max(1, _PDF_MAX_PAGES) or sum(map(len, pages)) >= _MAX_TEXT_CHARS
+
+
+def _extract_pdf_blocks(blocks: dict[int, bytes], size: int, start: int, max_pages: int, max_chars: int):
+    # Parse worker entry for Range-read PDFs: (texts, None) when done, or
+    # (None, (first, last)) naming the blocks needed to get further.
     try:
-        raw, content_type = _download_bytes(url)
+        return _extract_pdf_pages((blocks, size), start, max_pages, max_chars), None
+    except _MissingBlocks as e:
+        return None, (e.first, e.last)
+
+
+async def _fetch_blocks(url: str, blocks: dict[int, bytes], size: int, first: int, last: int) -> int:
+    start = first * _PDF_RANGE_BLOCK
+    end = min(size, (last + 1) * _PDF_RANGE_BLOCK) - 1
+    res = await _client.get(url, headers={**_default_headers(), "Range": f"bytes={start}-{end}"})
+    if res.status_code != 206:
+        raise httpx.HTTPError(f"Range request not honored: HTTP {res.status_code}")
+    data = res.content
+    for index in range(first, last + 1):
+        offset = index * _PDF_RANGE_BLOCK - start
+        blocks[index] = data[offset:offset + _PDF_RANGE_BLOCK]
+    return len(data)
+
+
+async def _extract_pdf_ranges(url: str, size: int, cached: list[str]) -> str:
+    # Starts from the first and last blocks (header, trailer and usually the
+    # xref), then fetches whatever the parser reports missing and reruns it.
+    last_block = (size - 1) // _PDF_RANGE_BLOCK
+    wanted = [(0, 0), (last_block, last_block)]
+    blocks: dict[int, bytes] = {}
+    fetched = 0
+    for _ in range(max(1, _PDF_RANGE_MAX_ROUNDS)):
+        for first, last in wanted:
+            fetched += await _fetch_blocks(url, blocks, size, first, last)
+        if fetched > _MAX_BYTES:
+            raise ValueError("PDF needs more than SEARCH_EXTRACT_MAX_BYTES")
+        texts, missing = await parse_pool.run(
+            _extract_pdf_blocks,
+            blocks,
+            size,
+            len(cached),
+            _PDF_MAX_PAGES,
+            _MAX_TEXT_CHARS - sum(map(len, cached)),
+        )
+        if missing is None:
+            return _store_pdf_pages(url, cached, texts)
+        wanted = [missing]
+    raise ValueError("PDF needs more than SEARCH_EXTRACT_PDF_RANGE_MAX_ROUNDS Range requests")
+
+
+async def _extract_pdf(url: str, raw: bytes, cached: list[str]) -> str:
+    texts = await parse_pool.run(
+        _extract_pdf_pages,
+        raw,
+        len(cached),
+        _PDF_MAX_PAGES,
+        _MAX_TEXT_CHARS - sum(map(len, cached)),
+    )
+    return _store_pdf_pages(url, cached, texts)
+
+
+def _store_pdf_pages(url: str, cached: list[str], texts: list[str]) -> str:
+    for offset, text in enumerate(texts):
+        pdf_page_cache.set(f"{url}#{len(cached) + offset}", text)
+    return _join_pages(cached + texts)
+
+
+def _extract_html_text(raw: bytes, charset: str = "utf-8") -> str:
+    html = raw.decode(charset, errors="ignore")
+
+    try:
+        soup = BeautifulSoup(html, _PREFERRED_PARSER)
+    except FeatureNotFound:
+        soup = BeautifulSoup(html, "html.parser")
+
+    for tag in soup(list(_SKIP_TAGS)):
+        tag.decompose()
+
+    text = soup.get_text(separator=" ")
+    return " ".join(text.split())
 
-        if _is_probably_pdf(url, content_type, raw):
-            return _extract_pdf_text(raw)
 
-        html = raw.decode("utf-8", errors="ignore")
+class HtmlTextStream:
+    # lxml parser target: text arrives as the page is fed in chunks, boilerplate
+    # subtrees are skipped without building a tree, and feed() reports when
+    # enough text has been collected to stop downloading.
+    def __init__(self, charset: str = "utf-8", max_chars: int = _MAX_TEXT_CHARS):
+        from lxml import etree
 
+        self.max_chars = max_chars
+        self.size = 0
+        self._parts: list[str] = []
+        self._skip = 0
+        self._decoder = codecs.getincrementaldecoder(charset)(errors="ignore")
+        self._parser = etree.HTMLParser(target=self, recover=True, no_network=True)
+
+    def start(self, tag, attrib) -> None:
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+
+    def end(self, tag) -> None:
+        if tag in _SKIP_TAGS and self._skip:
+            self._skip -= 1
+
+    def data(self, text: str) -> None:
+        if not self._skip:
+            self._parts.append(text)
+            self.size += len(text)
+
+    def close(self) -> str:
+        return " ".join(" ".join(self._parts).split())
+
+    def feed(self, chunk: bytes) -> bool:
+        text = self._decoder.decode(chunk)
+        if text:
+            self._parser.feed(text)
+        return self.size >= self.max_chars
+
+    def finish(self) -> str:
+        text = self._decoder.decode(b"", final=True)
+        if text:
+            self._parser.feed(text)
         try:
-            soup = BeautifulSoup(html, _PREFERRED_PARSER)
-        except FeatureNotFound:
-            soup = BeautifulSoup(html, "html.parser")
+            self._parser.close()
+        except Exception:
+            pass
+        return self.close()
+
 
-        for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside", "iframe"]):
-            tag.decompose()
-            
-        text = soup.get_text(separator=" ")
-        return " ".join(text.split())
+def _streaming_available() -> bool:
+    try:
+        import lxml.etree  # noqa: F401
+    except Exception:
+        return False
+    return _STREAMING
+
+
+def _range_size(res: httpx.Response) -> int | None:
+    if (res.headers.get("Accept-Ranges") or "").strip().lower() != "bytes":
+        return None
+    length = res.headers.get("Content-Length") or ""
+    if not length.isdigit() or int(length) < _PDF_RANGE_MIN_BYTES:
+        return None
+    return int(length)
+
+
+async def _read_page(url: str, res: httpx.Response) -> str:
+    # HTML goes through HtmlTextStream and the download stops as soon as it has
+    # enough text. PDFs reuse cached pages, and large ones are read with Range
+    # requests instead of downloading the whole file.
+    content_type = _content_type(res)
+    header = res.headers.get("Content-Type") or ""
+    stream: HtmlTextStream | None = None
+    chunks: list[bytes] = []
+    total = 0
+    async for chunk in res.aiter_bytes(chunk_size=65536):
+        if not chunk:
+            continue
+        if not chunks and stream is None:
+            if _is_probably_pdf(url, content_type, chunk):
+                cached = await _cached_pdf_pages(url)
+                if _pdf_cache_satisfies(cached):
+                    return _join_pages(cached)
+                size = _range_size(res)
+                if size is not None:
+                    return await _extract_pdf_ranges(str(res.url), size, cached)
+            elif _streaming_available():
+                stream = HtmlTextStream(_charset(header, chunk))
+        total += len(chunk)
+        if stream is not None:
+            if stream.feed(chunk):
+                break
+        else:
+            chunks.append(chunk)
+        if total >= _MAX_BYTES:
+            break
+
+    if stream is not None:
+        return stream.finish()
+    raw = b"".join(chunks)
+    if _is_probably_pdf(url, content_type, raw):
+        return await _extract_pdf(url, raw, await _cached_pdf_pages(url))
+    return await parse_pool.run(_extract_html_text, raw, _charset(header, raw))
+
+
+def extraction_error(url: str, e: Exception) -> str:
+    msg = str(e).strip() or e.__class__.__name__
+    return f"[ERROR extracting {url}] {msg}"
+
+
+async def extract_page(url: str, validators: dict | None = None) -> dict:
+    text, page = await _download(url, validators, lambda res: _read_page(url, res))
+    page["text"] = text
+    return page
+
+
+async def extract_web_content(url: str) -> str:
+    try:
+        page = await extract_page(url)
+        return page["text"]
 
     except Exception as e:
-        msg = str(e).strip() or e.__class__.__name__
-        return f"[ERROR extracting {url}] {msg}"
+        return extraction_error(url, e)
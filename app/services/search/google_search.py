@@ -1,13 +1,14 @@
+import asyncio
 import os
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import httpx
 
 from app.services.search.cache import TTLCache
+from app.services.search.singleflight import SingleFlight
 
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
+GOOGLE_SEARCH_ENDPOINT = os.getenv("GOOGLE_SEARCH_ENDPOINT", "https://www.googleapis.com/customsearch/v1")
 
 GOOGLE_SEARCH_COUNT = int(os.getenv("GOOGLE_SEARCH_COUNT", "5"))
 GOOGLE_TIMEOUT_S = float(os.getenv("GOOGLE_SEARCH_TIMEOUT_S", "5"))
@@ -18,69 +19,87 @@ READ_TIMEOUT_S = float(os.getenv("GOOGLE_SEARCH_READ_TIMEOUT_S", str(GOOGLE_TIME
 
 RETRY_TOTAL = int(os.getenv("GOOGLE_SEARCH_RETRY_TOTAL", "1"))
 RETRY_BACKOFF = float(os.getenv("GOOGLE_SEARCH_RETRY_BACKOFF", "0.2"))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+POOL_MAX_CONNECTIONS = int(os.getenv("GOOGLE_SEARCH_MAX_CONNECTIONS", "20"))
 
 
 if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
     raise RuntimeError("Missing GOOGLE_API_KEY or GOOGLE_CSE_ID")
 
 
-google_cache = TTLCache(ttl=GOOGLE_CACHE_TTL_S)
-
+google_cache = TTLCache(ttl=GOOGLE_CACHE_TTL_S, namespace="search:google")
+google_inflight = SingleFlight("search:google")
 
-session = requests.Session()
 
-retries = Retry(
-    total=max(0, RETRY_TOTAL),
-    connect=max(0, RETRY_TOTAL),
-    read=max(0, RETRY_TOTAL),
-    status=max(0, RETRY_TOTAL),
-    backoff_factor=max(0.0, RETRY_BACKOFF),
-    status_forcelist=(429, 500, 502, 503, 504),
-    allowed_methods=frozenset(["GET"]),
-    raise_on_status=False,
-    respect_retry_after_header=True,
-)
+proxy = os.getenv("SEARCH_PROXY")
+http_proxy = os.getenv("SEARCH_HTTP_PROXY") or proxy
+https_proxy = os.getenv("SEARCH_HTTPS_PROXY") or proxy
 
-adapter = HTTPAdapter(
-    pool_connections=20,
-    pool_maxsize=20,
-    max_retries=retries,
+mounts = {
+    f"{scheme}://": httpx.AsyncHTTPTransport(proxy=url)
+    for scheme, url in {"http": http_proxy, "https": https_proxy}.items()
+    if url
+}
+
+client = httpx.AsyncClient(
+    timeout=httpx.Timeout(READ_TIMEOUT_S, connect=CONNECT_TIMEOUT_S),
+    limits=httpx.Limits(
+        max_connections=max(1, POOL_MAX_CONNECTIONS),
+        max_keepalive_connections=max(1, POOL_MAX_CONNECTIONS),
+    ),
+    mounts=mounts or None,
 )
 
-session.mount("http://", adapter)
-session.mount("https://", adapter)
 
+async def aclose() -> None:
+    await client.aclose()
 
-proxy = os.getenv("SEARCH_PROXY")
-http_proxy = os.getenv("SEARCH_HTTP_PROXY") or proxy
-https_proxy = os.getenv("SEARCH_HTTPS_PROXY") or proxy
 
-if http_proxy or https_proxy:
-    session.proxies.update(
-        {k: v for k, v in {"http": http_proxy, "https": https_proxy}.items() if v}
-    )
+def _retry_delay(attempt: int, res: httpx.Response | None = None) -> float:
+    delay = max(0.0, RETRY_BACKOFF) * (2 ** attempt)
+    retry_after = (res.headers.get("Retry-After") or "").strip() if res is not None else ""
+    if retry_after.isdigit():
+        delay = max(delay, float(retry_after))
+    return delay
 
 
-def google_search(query: str, num_results: int | None = None) -> list[str]:
+async def google_search(query: str, num_results: int | None = None) -> list[str]:
     num = num_results or GOOGLE_SEARCH_COUNT
     num = max(1, min(10, int(num)))
 
     cache_key = f"{query}:{num}"
-    cached = google_cache.get(cache_key)
+    cached = await google_cache.aget(cache_key)
     if cached:
         return cached
 
-    res = session.get(
-        "https://www.googleapis.com/customsearch/v1",
-        params={
-            "key": GOOGLE_API_KEY,
-            "cx": GOOGLE_CSE_ID,
-            "q": query,
-            "num": num,
-        },
-        timeout=(CONNECT_TIMEOUT_S, READ_TIMEOUT_S),
-        headers={"Accept": "application/json"},
-    )
+    return await google_inflight.do(cache_key, lambda: _fetch_links(query, num, cache_key))
+
+
+async def _fetch_links(query: str, num: int, cache_key: str) -> list[str]:
+    attempts = max(0, RETRY_TOTAL) + 1
+    for attempt in range(attempts):
+        try:
+            res = await client.get(
+                GOOGLE_SEARCH_ENDPOINT,
+                params={
+                    "key": GOOGLE_API_KEY,
+                    "cx": GOOGLE_CSE_ID,
+                    "q": query,
+                    "num": num,
+                },
+                headers={"Accept": "application/json"},
+            )
+        except httpx.TransportError:
+            if attempt + 1 >= attempts:
+                raise
+            await asyncio.sleep(_retry_delay(attempt))
+            continue
+
+        if res.status_code in RETRY_STATUS and attempt + 1 < attempts:
+            await asyncio.sleep(_retry_delay(attempt, res))
+            continue
+        break
 
     res.raise_for_status()
     data = res.json()
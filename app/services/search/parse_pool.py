@@ -0,0 +1,99 @@
+import asyncio
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_WORKERS = int(os.getenv("SEARCH_PARSE_WORKERS", str(min(2, os.cpu_count() or 1))))
+_MAX_TASKS_PER_CHILD = int(os.getenv("SEARCH_PARSE_MAX_TASKS_PER_CHILD", "50"))
+_CPU_TIMEOUT_S = int(os.getenv("SEARCH_PARSE_CPU_TIMEOUT_S", "5"))
+_START_METHOD = os.getenv("SEARCH_PARSE_START_METHOD", "spawn")
+
+_executor: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def _on_cpu_limit(signum, frame):
+    raise RuntimeError("Parse exceeded its CPU time limit")
+
+
+def _init_worker() -> None:
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _call(fn, args: tuple, cpu_timeout_s: int):
+    # RLIMIT_CPU counts the worker's whole lifetime, so each job moves the soft
+    # limit to the CPU time used so far plus its own allowance.
+    try:
+        import resource
+    except ImportError:
+        return fn(*args)
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime) + max(1, cpu_timeout_s)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    try:
+        return fn(*args)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=_WORKERS,
+                mp_context=multiprocessing.get_context(_START_METHOD),
+                initializer=_init_worker,
+                max_tasks_per_child=max(1, _MAX_TASKS_PER_CHILD),
+            )
+        return _executor
+
+
+def _discard(executor: ProcessPoolExecutor, kill: bool = False) -> None:
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    if kill:
+        # A job stuck in C code never sees SIGXCPU's Python handler; jobs sharing
+        # the pool fail with it and the next call starts fresh workers.
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run(fn, *args, cpu_timeout_s: int = _CPU_TIMEOUT_S):
+    # CPU-bound parsing (raw bytes in, text out) in worker processes so it never
+    # holds this process's GIL. fn must be a picklable module-level function.
+    # With SEARCH_PARSE_WORKERS=0 it runs in a thread instead.
+    if _WORKERS <= 0:
+        return await asyncio.to_thread(fn, *args)
+
+    executor = _pool()
+    try:
+        future = asyncio.get_running_loop().run_in_executor(executor, _call, fn, args, cpu_timeout_s)
+        # The CPU limit normally stops the job inside the worker; this catches
+        # workers stuck in C code or not using CPU at all.
+        return await asyncio.wait_for(future, timeout=cpu_timeout_s * 2 + 1)
+    except asyncio.TimeoutError:
+        _discard(executor, kill=True)
+        raise TimeoutError("Parser worker timed out")
+    except BrokenProcessPool:
+        _discard(executor)
+        raise RuntimeError("Parser worker crashed")
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
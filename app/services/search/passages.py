@@ -0,0 +1,96 @@
+import os
+import re
+
+import numpy as np
+
+_PASSAGE_CHARS = int(os.getenv("SEARCH_PASSAGE_CHARS", "500"))
+_MAX_INPUT_CHARS = int(os.getenv("SEARCH_PASSAGE_MAX_INPUT_CHARS", "200000"))
+_BM25_K1 = float(os.getenv("SEARCH_PASSAGE_BM25_K1", "1.2"))
+_BM25_B = float(os.getenv("SEARCH_PASSAGE_BM25_B", "0.75"))
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def split_passages(text: str, passage_chars: int = _PASSAGE_CHARS) -> list[str]:
+    # Packs whole sentences into passages of about passage_chars; runs without
+    # punctuation (menus, tables) are cut at word boundaries instead.
+    passages: list[str] = []
+    current = ""
+    for sentence in _SENTENCE_RE.split(text):
+        while len(sentence) > passage_chars:
+            cut = sentence.rfind(" ", 0, passage_chars)
+            if cut <= 0:
+                cut = passage_chars
+            if current:
+                passages.append(current)
+                current = ""
+            passages.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > passage_chars:
+            passages.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        passages.append(current)
+    return passages
+
+
+def bm25_scores(query: str, passages: list[str], k1: float = _BM25_K1, b: float = _BM25_B) -> np.ndarray:
+    # Term counts are gathered only for query terms, as (passage, term) pairs,
+    # so the matrix stays passages x query terms however large the page is.
+    query_terms = list(dict.fromkeys(_tokens(query)))
+    if not query_terms or not passages:
+        return np.zeros(len(passages), dtype=np.float64)
+
+    term_index = {term: i for i, term in enumerate(query_terms)}
+    doc_ids: list[int] = []
+    term_ids: list[int] = []
+    lengths = np.empty(len(passages), dtype=np.float64)
+    for doc, passage in enumerate(passages):
+        tokens = _tokens(passage)
+        lengths[doc] = len(tokens)
+        for token in tokens:
+            term = term_index.get(token)
+            if term is not None:
+                doc_ids.append(doc)
+                term_ids.append(term)
+
+    n_docs, n_terms = len(passages), len(query_terms)
+    tf = np.bincount(
+        np.asarray(doc_ids, dtype=np.int64) * n_terms + np.asarray(term_ids, dtype=np.int64),
+        minlength=n_docs * n_terms,
+    ).reshape(n_docs, n_terms).astype(np.float64)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(1.0, float(lengths.mean())))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None])) @ idf
+
+
+def select_passages(query: str, text: str, max_chars: int, passage_chars: int = _PASSAGE_CHARS) -> str:
+    # Best-scoring passages that fit in max_chars, most relevant first so a later
+    # cut from the end drops the weakest ones. Pages with no query term keep their start.
+    if not text or len(text) <= max_chars:
+        return text
+
+    passages = split_passages(text[:_MAX_INPUT_CHARS], passage_chars)
+    scores = bm25_scores(query, passages)
+    if not np.any(scores > 0):
+        return text[:max_chars]
+
+    selected: list[str] = []
+    used = 0
+    for index in np.argsort(-scores, kind="stable"):
+        if scores[index] <= 0:
+            break
+        passage = passages[index]
+        if used + len(passage) + 1 > max_chars:
+            continue
+        selected.append(passage)
+        used += len(passage) + 1
+    return "\n".join(selected) if selected else text[:max_chars]
@@ -1,20 +1,58 @@
+from app.core.metrics import SEARCH_EXTRACTIONS, observe_stages
 from app.services.search.cache import TTLCache
 from app.services.search.google_search import google_search
-from app.services.search.extractor import extract_web_content
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from app.services.search.content_store import content_store
+from app.services.search.dedup import NearDuplicateIndex
+from app.services.search.domain_policy import domain_policy
+from app.services.search.domain_stats import domain_stats
+from app.services.search.extractor import extract_page, extraction_error
+from app.services.search.passages import select_passages
+from app.services.search.singleflight import SingleFlight
+import asyncio
 import os
 import time
 from typing import Optional
 
-query_cache = TTLCache(ttl=300)
-
-url_cache = TTLCache(ttl=60 * 60 * 6)
-
-url_error_cache = TTLCache(ttl=int(os.getenv("SEARCH_URL_ERROR_CACHE_TTL_S", "60")))
+query_cache = TTLCache(
+    ttl=300,
+    namespace="search:query",
+    max_entries=int(os.getenv("SEARCH_QUERY_CACHE_MAX_ENTRIES", "2000")),
+)
+
+url_cache = TTLCache(
+    ttl=60 * 60 * 6,
+    namespace="search:url",
+    max_entries=int(os.getenv("SEARCH_URL_CACHE_MAX_ENTRIES", "3000")),
+    max_bytes=int(os.getenv("SEARCH_URL_CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+)
+
+url_error_cache = TTLCache(
+    ttl=int(os.getenv("SEARCH_URL_ERROR_CACHE_TTL_S", "60")),
+    namespace="search:url_error",
+)
+
+# Syndicated articles: a URL whose text repeats an indexed page shares that page's url_cache entry.
+dedup_index = (
+    NearDuplicateIndex(
+        max_distance=int(os.getenv("SEARCH_DEDUP_MAX_DISTANCE", "3")),
+        max_entries=int(os.getenv("SEARCH_DEDUP_MAX_ENTRIES", "5000")),
+    )
+    if os.getenv("SEARCH_DEDUP", "1") == "1"
+    else None
+)
+
+query_inflight = SingleFlight("search:query")
+
+url_inflight = SingleFlight("search:url")
 
 _MAX_URLS_PER_QUERY = int(os.getenv("SEARCH_MAX_URLS_PER_QUERY", "2"))
-_EXTRACT_WORKERS = int(os.getenv("SEARCH_EXTRACT_WORKERS", "8"))
+# Extra search results kept as hedges for URLs that stall or fail.
+_MAX_CANDIDATE_URLS = int(os.getenv("SEARCH_MAX_CANDIDATE_URLS", "4"))
 _SEARCH_TOTAL_BUDGET_S = float(os.getenv("SEARCH_TOTAL_BUDGET_S", "2.5"))
+_RESULT_MAX_CHARS = int(os.getenv("SEARCH_RESULT_MAX_CHARS", "3000"))
+
+# Extractions still running when the budget expires keep going so they warm url_cache.
+_background_tasks: set[asyncio.Task] = set()
 
 
 def _is_usable_content(text: str) -> bool:
@@ -25,79 +63,166 @@ def _is_usable_content(text: str) -> bool:
     return len(text) >= 256
 
 
-def _get_cached_or_extract(url: str) -> str:
-    cached_error = url_error_cache.get(url)
+async def _get_cached_or_extract(url: str) -> str:
+    cached_error = await url_error_cache.aget(url)
     if cached_error:
         return cached_error
-    cached = url_cache.get(url)
+    cached = await url_cache.aget(_cache_key(url))
     if cached:
         return cached
-    text = extract_web_content(url)
+    return await url_inflight.do(url, lambda: _extract_and_cache(url))
+
+
+def _cache_key(url: str) -> str:
+    return dedup_index.canonical(url) if dedup_index is not None else url
+
+
+async def extract_web_content(url: str) -> str:
+    stored = await asyncio.to_thread(content_store.get, url) if content_store is not None else None
+    if stored is not None and content_store.is_fresh(stored):
+        return stored["text"]
+
+    # Only network fetches (including 304 revalidations) feed the domain stats.
+    t0 = time.perf_counter()
+    text = await _fetch_page(url, stored)
+    domain_stats.observe(url, time.perf_counter() - t0, _is_usable_content(text or ""))
+    return text
+
+
+async def _fetch_page(url: str, stored: dict | None) -> str:
+    try:
+        page = await extract_page(url, stored)
+    except Exception as e:
+        return extraction_error(url, e)
+
+    if page["not_modified"] and stored is not None:
+        await asyncio.to_thread(content_store.touch, url)
+        return stored["text"]
+
+    text = page["text"]
+    if content_store is not None and text:
+        await asyncio.to_thread(content_store.put, url, text, page["etag"], page["last_modified"])
+    return text
+
+
+async def _extract_and_cache(url: str) -> str:
+    t0 = time.perf_counter()
+    text = await extract_web_content(url)
+    observe_stages("search", {"extract_ms": (time.perf_counter() - t0) * 1000})
     if text and text.startswith("[ERROR extracting"):
         url_error_cache.set(url, text)
+    elif dedup_index is not None and _is_usable_content(text):
+        url_cache.set(await asyncio.to_thread(dedup_index.add, url, text), text)
     else:
         url_cache.set(url, text)
     return text
 
-def search_and_extract(query: str):
-    cached = query_cache.get(query)
+async def search_and_extract(query: str):
+    cached = await query_cache.aget(query)
     if cached:
         return cached
 
-    urls = google_search(query)
-    
+    return await query_inflight.do(query, lambda: _search_and_extract(query))
+
+
+async def _search_and_extract(query: str):
+    t_start = time.perf_counter()
+    urls = await google_search(query)
+    observe_stages("search", {"google_ms": (time.perf_counter() - t_start) * 1000})
+
+    # URLs already known to carry the same article as an earlier result are dropped.
     seen: set[str] = set()
-    urls = [u for u in urls if not (u in seen or seen.add(u))]
-    urls = urls[: max(1, min(_MAX_URLS_PER_QUERY, len(urls)))]
+    keys = [_cache_key(u) for u in urls]
+    urls = [u for u, key in zip(urls, keys) if not (key in seen or seen.add(key))]
+    # Denied domains are dropped; trusted and reliably extractable domains move up.
+    urls = domain_policy.rank(urls)[: max(1, _MAX_URLS_PER_QUERY, _MAX_CANDIDATE_URLS)]
 
     contents: list[dict] = []
     seen_result_urls: set[str] = set()
     best: Optional[dict] = None
-    
-    
-    t0 = time.perf_counter()
-    with ThreadPoolExecutor(max_workers=min(_EXTRACT_WORKERS, max(1, len(urls)))) as executor:
-        future_to_url = {executor.submit(_get_cached_or_extract, url): url for url in urls}
-
-        budget_s = max(0.25, _SEARCH_TOTAL_BUDGET_S)
-        timeout_s = max(0.0, budget_s - (time.perf_counter() - t0))
-        try:
-            iterator = as_completed(future_to_url, timeout=timeout_s)
-        except TypeError:
-            
-            iterator = as_completed(future_to_url)
-
-        try:
-            for future in iterator:
-                if (time.perf_counter() - t0) > budget_s:
-                    break
 
-                url = future_to_url[future]
+    def consume(url: str, text: str) -> None:
+        nonlocal best
+        if url in seen_result_urls:
+            return
+        seen_result_urls.add(url)
+
+        usable = _is_usable_content(text or "")
+        if usable:
+            text = select_passages(query, text, _RESULT_MAX_CHARS)
+        item = {"url": url, "content": (text or "")[:_RESULT_MAX_CHARS]}
+        contents.append(item)
+
+        if best is None and usable:
+            best = item
+
+    # One round trip for every candidate URL when the cache is shared.
+    cached_errors = await url_error_cache.aget_many(urls)
+    cached_texts = await url_cache.aget_many([_cache_key(u) for u in urls])
+    to_extract = []
+    for url, cached_error, cached_text in zip(urls, cached_errors, cached_texts):
+        if cached_error or cached_text:
+            consume(url, cached_error or cached_text)
+        else:
+            to_extract.append(url)
+
+    t0 = time.perf_counter()
+    budget_s = max(0.25, _SEARCH_TOTAL_BUDGET_S)
+    fanout = max(1, _MAX_URLS_PER_QUERY)
+    queue = to_extract
+    task_to_url = {}
+    pending: set[asyncio.Task] = set()
+    hedge_at = float("inf")
+
+    def launch(kind: str) -> None:
+        # The next candidate starts once the running ones are past their domain's
+        # usual latency, or right away when one finishes without usable content.
+        nonlocal hedge_at
+        url = queue.pop(0)
+        task = asyncio.create_task(_get_cached_or_extract(url))
+        task_to_url[task] = url
+        pending.add(task)
+        SEARCH_EXTRACTIONS.inc(kind=kind)
+        remaining_s = budget_s - (time.perf_counter() - t0)
+        hedge_at = time.perf_counter() + max(
+            domain_stats.hedge_delay_s(task_to_url[t], remaining_s) for t in pending
+        )
+
+    if best is None:
+        while queue and len(pending) < fanout:
+            launch("primary")
+
+    try:
+        while pending and best is None:
+            now = time.perf_counter()
+            timeout_s = budget_s - (now - t0)
+            if timeout_s <= 0:
+                break
+            if queue:
+                timeout_s = min(timeout_s, max(0.0, hedge_at - now))
+
+            done, pending = await asyncio.wait(pending, timeout=timeout_s, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url = task_to_url[task]
                 try:
-                    text = future.result()
+                    text = task.result()
                 except Exception as exc:
                     print(f"URL {url} generated an exception: {exc}")
                     text = "[ERROR extracting] exception"
 
-                if url in seen_result_urls:
-                    continue
-                seen_result_urls.add(url)
-
-                item = {"url": url, "content": (text or "")[:3000]}
-                contents.append(item)
-
-                if best is None and _is_usable_content(text or ""):
-                    best = item
-                    
+                consume(url, text)
+                if best is not None:
                     break
-        except Exception:
-            
-            pass
-        finally:
-            
-            for f in future_to_url:
-                if not f.done():
-                    f.cancel()
+
+            if best is None and queue:
+                if time.perf_counter() >= hedge_at:
+                    launch("hedge")
+                while queue and len(pending) < fanout:
+                    launch("replacement")
+    finally:
+        for task in pending:
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
 
     if best is not None:
         contents = [best]
@@ -108,4 +233,5 @@ def search_and_extract(query: str):
     }
 
     query_cache.set(query, result)
+    observe_stages("search", {"query_ms": (time.perf_counter() - t_start) * 1000})
     return result
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable
+
+from app.core.metrics import CallbackMetric
+
+
+_groups: "weakref.WeakSet[SingleFlight]" = weakref.WeakSet()
+
+
+def _group_samples(field: str):
+    for group in list(_groups):
+        yield {"group": group.name}, group.stats()[field]
+
+
+CallbackMetric(
+    "dinacom_singleflight_calls_total",
+    "Computations started by SingleFlight.",
+    "counter",
+    lambda: _group_samples("calls"),
+)
+CallbackMetric(
+    "dinacom_singleflight_coalesced_total",
+    "Callers that joined an in-flight computation instead of starting one.",
+    "counter",
+    lambda: _group_samples("coalesced"),
+)
+
+
+class SingleFlight:
+    # Callers sharing a key await one task; the task is shielded so a cancelled
+    # caller does not cancel the work the others are waiting on.
+    def __init__(self, name: str = "unnamed"):
+        self.name = name
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        _groups.add(self)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            with self._lock:
+                self.calls += 1
+        else:
+            with self._lock:
+                self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+            }
@@ -0,0 +1,188 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+
+from app.services.search.cache import _redis_client
+
+_BACKEND = os.getenv("SESSION_BACKEND", "memory").strip().lower() or "memory"
+_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+_TTL_S = float(os.getenv("SESSION_TTL_S", str(60 * 60 * 24)))
+_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "data/sessions.sqlite3")
+_REDIS_URL = os.getenv("SESSION_REDIS_URL") or os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+_REDIS_PREFIX = os.getenv("CACHE_REDIS_PREFIX", "dinacom")
+# Sessions are read on every turn, but a miss loses the conversation, so they get a
+# longer budget than the cache's CACHE_REDIS_TIMEOUT_S.
+_REDIS_TIMEOUT_S = float(os.getenv("SESSION_REDIS_TIMEOUT_S", "1"))
+
+
+def _message(role: str, content: str) -> dict:
+    return {"role": role, "content": content}
+
+
+class SessionStore:
+    # Keeps only the newest max_messages per session; older turns are dropped on append.
+    # `blocking` stores do I/O and are called from a worker thread.
+    blocking = False
+
+    def get(self, session_id: str) -> list[dict]:
+        raise NotImplementedError
+
+    def append(self, session_id: str, messages: list[dict]) -> None:
+        raise NotImplementedError
+
+    def clear(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, max_sessions: int = _MAX_SESSIONS, max_messages: int = _MAX_MESSAGES, ttl: float = _TTL_S):
+        self.max_sessions = max(1, max_sessions)
+        self.max_messages = max(1, max_messages)
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, tuple[float, deque]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> list[dict]:
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is None:
+                return []
+            expires, messages = data
+            if time.monotonic() > expires:
+                del self._sessions[session_id]
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(messages)
+
+    def append(self, session_id: str, messages: list[dict]) -> None:
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is None or time.monotonic() > data[0]:
+                stored = deque(maxlen=self.max_messages)
+            else:
+                stored = data[1]
+            stored.extend(_message(m["role"], m["content"]) for m in messages)
+            self._sessions[session_id] = (time.monotonic() + self.ttl, stored)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    blocking = True
+
+    def __init__(self, path: str = _SQLITE_PATH, max_messages: int = _MAX_MESSAGES, ttl: float = _TTL_S):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_messages = max(1, max_messages)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        self.prune()
+
+    def get(self, session_id: str) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM ("
+                " SELECT id, role, content FROM messages WHERE session_id = ? AND created_at >= ?"
+                " ORDER BY id DESC LIMIT ?"
+                ") ORDER BY id",
+                (session_id, time.time() - self.ttl, self.max_messages),
+            ).fetchall()
+        return [_message(role, content) for role, content in rows]
+
+    def append(self, session_id: str, messages: list[dict]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    [(session_id, m["role"], m["content"], now) for m in messages],
+                )
+                self._conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND id <= ("
+                    " SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (session_id, session_id, self.max_messages),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def prune(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE created_at < ?", (time.time() - self.ttl,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RedisSessionStore(SessionStore):
+    # One list per session; RPUSH + LTRIM + EXPIRE in a single pipeline.
+    blocking = True
+
+    def __init__(
+        self,
+        url: str = _REDIS_URL,
+        max_messages: int = _MAX_MESSAGES,
+        ttl: float = _TTL_S,
+        client=None,
+        timeout_s: float = _REDIS_TIMEOUT_S,
+    ):
+        self.prefix = f"{_REDIS_PREFIX}:session:"
+        self.max_messages = max(1, max_messages)
+        self.ttl = ttl
+        self.client = client if client is not None else _redis_client(url, timeout_s)
+
+    def get(self, session_id: str) -> list[dict]:
+        raw = self.client.lrange(self.prefix + session_id, -self.max_messages, -1)
+        return [json.loads(item) for item in raw]
+
+    def append(self, session_id: str, messages: list[dict]) -> None:
+        key = self.prefix + session_id
+        pipe = self.client.pipeline()
+        pipe.rpush(key, *[json.dumps(_message(m["role"], m["content"]), ensure_ascii=False) for m in messages])
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.pexpire(key, max(1, int(self.ttl * 1000)))
+        pipe.execute()
+
+    def clear(self, session_id: str) -> None:
+        self.client.delete(self.prefix + session_id)
+
+
+def create_session_store() -> SessionStore:
+    if _BACKEND == "sqlite":
+        return SQLiteSessionStore()
+    if _BACKEND == "redis":
+        return RedisSessionStore()
+    if _BACKEND != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND: {_BACKEND}")
+    return MemorySessionStore()
@@ -0,0 +1,88 @@
+"""Micro-benchmark: TTLCache get/set throughput under thread contention.
+
+Runs offline. Compares a single-shard cache (one lock, like the old TTLCache)
+against sharded caches: throughput (median of a few runs) and the longest
+single get() while expired entries are swept, which holds one shard's lock
+for the whole sweep. Usage:
+
+    python -m app.test.bench_cache [threads] [ops_per_thread]
+"""
+
+from __future__ import annotations
+
+import gc
+import random
+import statistics
+import sys
+import threading
+import time
+
+
+def _run(cache, threads: int, ops: int, keyspace: int) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed: int) -> None:
+        rnd = random.Random(seed)
+        keys = [f"k{rnd.randrange(keyspace)}" for _ in range(ops)]
+        barrier.wait()
+        for i, key in enumerate(keys):
+            if i % 4 == 0:
+                cache.set(key, "v" * 64)
+            else:
+                cache.get(key)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for t in pool:
+        t.join()
+    return (threads * ops) / (time.perf_counter() - t0)
+
+
+def _sweep_pause_ms(shards: int, entries: int = 100000) -> float:
+    from app.services.search.cache import MemoryBackend
+
+    cache = MemoryBackend(max_entries=entries, shards=shards, sweep_interval_s=0.05)
+    for i in range(entries):
+        cache.set(f"k{i}", "v", ttl=0.01)
+    time.sleep(0.1)
+    # Collector pauses would otherwise swamp the per-shard sweeps being measured.
+    gc.collect()
+    gc.disable()
+    try:
+        worst = 0.0
+        for i in range(shards * 64):
+            t0 = time.perf_counter()
+            cache.get(f"k{i}")
+            worst = max(worst, time.perf_counter() - t0)
+    finally:
+        gc.enable()
+    return worst * 1000
+
+
+def main() -> None:
+    from app.services.search.cache import TTLCache
+
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    keyspace = 5000
+    repeats = 5
+
+    for shards in (1, 4, 16, 64):
+        rates = []
+        for _ in range(repeats):
+            cache = TTLCache(ttl=300, max_entries=keyspace // 2, shards=shards)
+            rates.append(_run(cache, threads, ops, keyspace))
+        stats = cache.stats()
+        hit_ratio = stats["hits"] / max(1, stats["hits"] + stats["misses"])
+        print(
+            f"shards={shards:<3} threads={threads} ops/s={statistics.median(rates):,.0f} "
+            f"(min {min(rates):,.0f} max {max(rates):,.0f}) entries={stats['entries']} "
+            f"hit_ratio={hit_ratio:.2f} sweep_pause={statistics.median(_sweep_pause_ms(shards) for _ in range(3)):.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark HTML text extraction: full BeautifulSoup parse vs streaming.
+
+Feeds each page in 64 KB chunks, as the downloader does, and reports CPU time
+and bytes consumed per page for both extractors. Pages come from a directory
+of saved .html files, or are generated when no corpus is given:
+
+    python -m app.test.bench_extract --corpus saved_pages/
+    python -m app.test.bench_extract --pages 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+_CHUNK = 65536
+
+
+def _synthetic_page(rng: random.Random, i: int) -> bytes:
+    # Shaped like a news article: heavy inline scripts, menus, a long body and
+    # a comment/related-article tail.
+    from app.test.mock_upstreams import _PARAGRAPH
+
+    script = "<script>window.__STATE__=" + "{\"k\":\"" + "x" * rng.randint(20000, 200000) + "\"};</script>"
+    menu = "<nav>" + "".join(f"<a href='/k{j}'>Kategori {j}</a>" for j in range(rng.randint(50, 300))) + "</nav>"
+    body = "".join(f"<p>{_PARAGRAPH}</p>" for _ in range(rng.randint(40, 400)))
+    related = "<aside>" + "".join(f"<div><a href='/r{j}'>Artikel terkait {j}</a></div>" for j in range(200)) + "</aside>"
+    return (
+        f"<!doctype html><html><head><meta charset='utf-8'><title>Artikel {i}</title>{script}"
+        f"<style>{'.c{margin:0}' * 2000}</style></head><body><header>{menu}</header>"
+        f"<main><h1>Artikel {i}</h1>{body}</main>{related}<footer>Hak cipta</footer></body></html>"
+    ).encode("utf-8")
+
+
+def _load(corpus: str | None, pages: int) -> list[bytes]:
+    if corpus:
+        return [p.read_bytes() for p in sorted(Path(corpus).glob("*.htm*"))]
+    rng = random.Random(0)
+    return [_synthetic_page(rng, i) for i in range(pages)]
+
+
+def _full(raw: bytes) -> tuple[str, int]:
+    from app.services.search.extractor import _MAX_BYTES, _charset, _extract_html_text
+
+    raw = raw[:_MAX_BYTES]
+    return _extract_html_text(raw, _charset("", raw)), len(raw)
+
+
+def _streaming(raw: bytes) -> tuple[str, int]:
+    from app.services.search.extractor import _MAX_BYTES, HtmlTextStream, _charset
+
+    stream = HtmlTextStream(_charset("", raw[:_CHUNK]))
+    consumed = 0
+    while consumed < min(len(raw), _MAX_BYTES):
+        chunk = raw[consumed:consumed + _CHUNK]
+        consumed += len(chunk)
+        if stream.feed(chunk):
+            break
+    return stream.finish(), consumed
+
+
+def _run(pages: list[bytes], extract) -> tuple[float, int, list[str]]:
+    texts = []
+    consumed = 0
+    t0 = time.process_time()
+    for raw in pages:
+        text, n = extract(raw)
+        texts.append(text)
+        consumed += n
+    return time.process_time() - t0, consumed, texts
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="directory of saved .html pages")
+    parser.add_argument("--pages", type=int, default=30, help="generated pages when no corpus is given")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    pages = _load(args.corpus, args.pages)
+    if not pages:
+        raise SystemExit("no pages to benchmark")
+
+    full_s, full_bytes, full_texts = _run(pages, _full)
+    stream_s, stream_bytes, stream_texts = _run(pages, _streaming)
+
+    # The streamed text is the start of the full text, minus whatever was not downloaded.
+    prefix = sum(1 for a, b in zip(full_texts, stream_texts) if a.startswith(b[:-200]))
+
+    n = len(pages)
+    print(f"{n} pages, {sum(map(len, pages)) / n / 1024:.0f} KB average")
+    print(f"  full       cpu={full_s / n * 1000:7.2f}ms/page  bytes={full_bytes / n / 1024:7.0f}KB/page")
+    print(f"  streaming  cpu={stream_s / n * 1000:7.2f}ms/page  bytes={stream_bytes / n / 1024:7.0f}KB/page")
+    print(f"  cpu {full_s / max(stream_s, 1e-9):.1f}x, bytes {full_bytes / max(stream_bytes, 1):.1f}x, text prefix match {prefix}/{n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark chat-history formatting on long sessions.
+
+Simulates a session growing to --messages messages, two per turn, and times
+the full formatter against the per-session incremental formatter at several
+ORCH_MAX_HISTORY_CHARS budgets. Also checks both produce identical text, for
+the growing session, for a client that only sends the last few messages and
+for sessions full of short repeated replies.
+
+    python -m app.test.bench_history --messages 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+
+
+def _message(rng: random.Random, i: int) -> dict:
+    words = " ".join(rng.choice(["gizi", "telur", "protein", "kalori", "sayur", "air", "tidur"]) for _ in range(rng.randint(5, 120)))
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}: {words}"}
+
+
+def _bench(history: list[dict], max_chars: int, turns: int) -> tuple[float, float]:
+    from app.ai.history import IncrementalHistory, format_history
+
+    start = len(history) - 2 * turns
+    incremental = IncrementalHistory(max_chars)
+    incremental.format("bench", history[:start])
+
+    full_s = 0.0
+    incremental_s = 0.0
+    for n in range(start + 2, len(history) + 1, 2):
+        window = history[:n]
+
+        t0 = time.perf_counter()
+        expected = format_history(window, max_chars)
+        full_s += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        text = incremental.format("bench", window)
+        incremental_s += time.perf_counter() - t0
+
+        assert text == expected, f"mismatch at {n} messages"
+
+    return full_s / turns * 1e6, incremental_s / turns * 1e6
+
+
+def _check_sliding(history: list[dict], max_chars: int, size: int = 6) -> None:
+    # A window of the last `size` messages sliding by one turn, where the newest
+    # answer repeats: count and last message match, the rest has shifted.
+    from app.ai.history import IncrementalHistory, format_history
+
+    history = [dict(m) for m in history[: size + 20]]
+    for i in range(1, len(history), 2):
+        history[i]["content"] = "Maaf, bisa diulangi pertanyaannya?"
+
+    incremental = IncrementalHistory(max_chars)
+    for end in range(size, len(history) + 1, 2):
+        window = history[end - size:end]
+        assert incremental.format("sliding", window) == format_history(window, max_chars), f"stale sliding window at {end}"
+
+
+def _check_repeats(max_chars: int, trials: int = 300) -> None:
+    # Short, often identical messages and clients that send the last few of
+    # them: any window the formatter reuses must still match format_history.
+    from app.ai.history import IncrementalHistory, format_history
+
+    first = [{"role": "user", "content": "ok"}, {"role": "assistant", "content": "B"}] * 2
+    first[-1] = {"role": "assistant", "content": "A"}
+    second = [{"role": "user", "content": "ok"}, {"role": "assistant", "content": "A"}] * 2
+    incremental = IncrementalHistory(max_chars)
+    for window in (first, second):
+        assert incremental.format("repeat", window) == format_history(window, max_chars), "stale repeated window"
+
+    rng = random.Random(max_chars)
+    for trial in range(trials):
+        replies = ["ok", "A", "B", "ya"] if trial % 2 else ["ok", "A", "B", "ya", "telur rebus " * rng.randint(1, 40)]
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": rng.choice(replies)} for i in range(40)]
+        incremental = IncrementalHistory(max_chars)
+        end = rng.randint(1, 10)
+        for _ in range(8):
+            window = history[max(0, end - rng.choice([4, 6, end])):end]
+            assert incremental.format("fuzz", window) == format_history(window, max_chars), f"mismatch in trial {trial}"
+            end = min(len(history), end + rng.randint(0, 3))
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=500, help="timed turns at the end of the session")
+    parser.add_argument("--budgets", default="4000,32000,200000", help="ORCH_MAX_HISTORY_CHARS values")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    rng = random.Random(0)
+    history = [_message(rng, i) for i in range(args.messages)]
+    turns = min(args.turns, args.messages // 2 - 1)
+
+    print(f"{args.messages} messages, {turns} timed turns (2 new messages per turn)")
+    for budget in [int(b) for b in args.budgets.split(",") if b.strip()]:
+        _check_sliding(history, budget)
+        _check_repeats(budget)
+        full_us, incremental_us = _bench(history, budget, turns)
+        print(
+            f"  max_chars={budget:<8} full={full_us:9.1f}us/turn "
+            f"incremental={incremental_us:9.1f}us/turn ({full_us / max(incremental_us, 1e-9):.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
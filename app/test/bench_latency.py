@@ -0,0 +1,168 @@
+"""Offline latency benchmark for the chat, foodscan and user-insight endpoints.
+
+Starts local mock upstreams (OpenAI, Google CSE, HTML/PDF pages), points the
+app at them and drives the ASGI app in-process at a fixed concurrency.
+Reports throughput plus p50/p95/p99 end-to-end and per-stage latencies.
+
+    python -m app.test.bench_latency --requests 200 --concurrency 50 \\
+        --openai-latency-ms 300 --openai-jitter-ms 80 --web-failure-rate 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+
+_MESSAGES = [
+    "berapa jumlah kasus diare terbaru",
+    "berapa kalori telur rebus",
+    "data statistik stunting hari ini",
+    "harga vaksin flu sekarang",
+    "kasus demam berdarah naik",
+    "perbandingan protein telur dan tahu",
+    "apakah makan telur tiap hari aman",
+    "halo",
+]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _summary(name: str, values: list[float]) -> str:
+    return (
+        f"  {name:<14} p50={_percentile(values, 50):8.1f}ms "
+        f"p95={_percentile(values, 95):8.1f}ms p99={_percentile(values, 99):8.1f}ms"
+    )
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default="chat,foodscan,user-insight")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--distinct", type=int, default=len(_MESSAGES), help="distinct payloads per endpoint")
+    for upstream, latency in (("openai", 200.0), ("cse", 80.0), ("web", 120.0)):
+        parser.add_argument(f"--{upstream}-latency-ms", type=float, default=latency)
+        parser.add_argument(f"--{upstream}-jitter-ms", type=float, default=latency / 4)
+        parser.add_argument(f"--{upstream}-failure-rate", type=float, default=0.0)
+    return parser.parse_args(argv)
+
+
+def _payloads(endpoint: str, n: int, distinct: int, image_base_url: str) -> list[tuple[str, dict]]:
+    distinct = max(1, distinct)
+    out = []
+    for i in range(n):
+        k = random.randrange(distinct)
+        if endpoint == "chat":
+            message = _MESSAGES[k % len(_MESSAGES)] + ("" if k < len(_MESSAGES) else f" {k}")
+            out.append(("/api/v1/ai/chat", {"message": message}))
+        elif endpoint == "foodscan":
+            # A fresh signature per request, like the app's signed upload URLs.
+            image_url = f"{image_base_url}/images/meal-{k}.jpg?sig={random.getrandbits(64):x}"
+            out.append(("/api/v1/ai/foodscan", {"image_url": image_url}))
+        elif endpoint == "user-insight":
+            out.append((
+                "/api/v1/ai/user-insight",
+                {
+                    "user": {"id": str(k), "name": f"user {k}", "age": 20 + k % 40, "gender": "female"},
+                    "daily_nutrition_summary": {"calories_kcal": 1800 + k, "vitamins": ["Vitamin C"]},
+                },
+            ))
+    return out
+
+
+async def _drive(app, endpoint: str, payloads: list[tuple[str, dict]], concurrency: int, token: str) -> None:
+    import httpx
+
+    latencies: list[float] = []
+    stages: dict[str, list[float]] = {}
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in payloads:
+        queue.put_nowait(item)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        while not queue.empty():
+            path, body = queue.get_nowait()
+            t0 = time.perf_counter()
+            try:
+                res = await client.post(path, json=body, headers={"Authorization": f"Bearer {token}"})
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if res.status_code != 200:
+                errors += 1
+                continue
+            for stage, value in (res.json().get("timings") or {}).items():
+                if stage.endswith("_ms"):
+                    stages.setdefault(stage[:-3], []).append(value)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(max(1, concurrency))))
+        elapsed = time.perf_counter() - t0
+
+    print(f"{endpoint}: {len(payloads)} requests, {errors} errors, {len(payloads) / elapsed:.1f} req/s")
+    print(_summary("end_to_end", latencies))
+    for stage, values in stages.items():
+        print(_summary(stage, values))
+
+
+async def _run(args: argparse.Namespace, token: str, image_base_url: str) -> None:
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        for endpoint in [e.strip() for e in args.endpoints.split(",") if e.strip()]:
+            payloads = _payloads(endpoint, args.requests, args.distinct, image_base_url)
+            await _drive(app, endpoint, payloads, args.concurrency, token)
+
+
+def main(argv: list[str] | None = None) -> None:
+    from app.test.mock_upstreams import MockUpstreams, UpstreamProfile
+
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    upstreams = MockUpstreams(
+        openai=UpstreamProfile(args.openai_latency_ms, args.openai_jitter_ms, args.openai_failure_rate),
+        cse=UpstreamProfile(args.cse_latency_ms, args.cse_jitter_ms, args.cse_failure_rate),
+        web=UpstreamProfile(args.web_latency_ms, args.web_jitter_ms, args.web_failure_rate),
+    ).start()
+
+    # The app reads its configuration from the environment at import time.
+    token = "bench-token"
+    os.environ.update(upstreams.env())
+    for key, value in {
+        "APP_NAME": "bench",
+        "ENV": "bench",
+        "SECRET_TOKEN": token,
+        "GROQ_APIKEY": "bench",
+        "OPENAI_API": "bench",
+        "GOOGLE_API_KEY": "bench",
+        "GOOGLE_CSE_ID": "bench",
+        "GOOGLE_SEARCH_COUNT": "5",
+        "ORCH_DEBUG": "0",
+    }.items():
+        os.environ.setdefault(key, value)
+    os.environ["SECRET_TOKEN"] = token
+
+    try:
+        asyncio.run(_run(args, token, upstreams.base_url))
+    finally:
+        upstreams.stop()
+        print(f"upstream calls: {upstreams.counts}")
+
+
+if __name__ == "__main__":
+    main()
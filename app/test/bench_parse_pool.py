@@ -0,0 +1,71 @@
+"""Benchmark event-loop responsiveness while PDFs are parsed.
+
+Parses --jobs generated PDFs concurrently while a ticker measures how late
+the event loop wakes up, first with parsing in threads (the old behavior),
+then in the parse process pool:
+
+    python -m app.test.bench_parse_pool --jobs 8 --pages 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+
+async def _measure(jobs: list[bytes]) -> tuple[float, list[float]]:
+    from app.services.search import parse_pool
+    from app.services.search.extractor import _extract_pdf_text
+
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            lags.append((time.perf_counter() - t0 - 0.005) * 1000)
+
+    tick = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(parse_pool.run(_extract_pdf_text, raw) for raw in jobs))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    await tick
+    return elapsed, lags
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=40, help="pages per PDF")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    from app.services.search import parse_pool
+    from app.test.mock_upstreams import make_pdf
+
+    jobs = [make_pdf(pages=args.pages) for _ in range(args.jobs)]
+    workers = parse_pool._WORKERS or 2
+
+    # Warm the pool so worker start-up is not counted.
+    parse_pool._WORKERS = workers
+    asyncio.run(_measure(jobs[:workers]))
+
+    print(f"{args.jobs} PDFs x {args.pages} pages")
+    for label, n in (("threads", 0), (f"processes({workers})", workers)):
+        parse_pool._WORKERS = n
+        elapsed, lags = asyncio.run(_measure(jobs))
+        lags.sort()
+        p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+        print(
+            f"  {label:<14} total={elapsed:6.2f}s  loop lag p50={statistics.median(lags) if lags else 0:6.1f}ms "
+            f"p99={p99:6.1f}ms max={max(lags, default=0):6.1f}ms"
+        )
+    parse_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""Local stand-ins for the OpenAI chat-completions API, Google CSE and web pages.
+
+Used by the offline benchmarks; nothing here touches the network. Each
+upstream has its own latency/jitter/failure profile.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+_PARAGRAPH = (
+    "Telur merupakan sumber protein hewani yang baik dan mengandung vitamin B12, "
+    "vitamin D, kolin serta lemak sehat. Konsumsi satu sampai dua butir telur per hari "
+    "umumnya aman bagi orang dewasa sehat, selama diimbangi pola makan bergizi seimbang, "
+    "aktivitas fisik teratur dan pengolahan yang tidak berlebihan minyak. "
+)
+
+_FOOD_JSON = {
+    "food_name": "Nasi goreng telur",
+    "food_type": "traditional",
+    "is_fast_food": False,
+    "calories_kcal": 520,
+    "nutrition": {"carbs_g": 68, "protein_g": 16, "fat_g": 20},
+    "vitamins": ["Vitamin A", "Vitamin B", "Iron"],
+    "health_score": 60,
+    "health_notes": "Porsi cukup besar, perhatikan minyak.",
+    "confidence_score": 0.8,
+}
+
+_INSIGHT_JSON = {
+    "health_score": 74,
+    "personal_ai_insight": "Pola makanmu sudah cukup seimbang, pertahankan asupan protein.",
+    "ai_important_notice": "Tambahkan sayur di setiap makan besar selama 7 hari ke depan.",
+    "confidence_level": 70,
+}
+
+
+class UpstreamProfile:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+
+    def wait(self) -> None:
+        delay = random.gauss(self.latency_ms, self.jitter_ms) if self.jitter_ms > 0 else self.latency_ms
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def should_fail(self) -> bool:
+        return self.failure_rate > 0 and random.random() < self.failure_rate
+
+
+def make_html(page_id: str, paragraphs: int = 12) -> bytes:
+    body = "".join(f"<p>{_PARAGRAPH}</p>" for _ in range(paragraphs))
+    return (
+        "<!doctype html><html><head><meta charset='utf-8'>"
+        f"<title>Halaman {page_id}</title><style>p{{margin:0}}</style>"
+        "<script>window.dataLayer=[];</script></head><body>"
+        "<header><nav><a href='/'>Beranda</a> <a href='/gizi'>Gizi</a></nav></header>"
+        f"<main><h1>Artikel kesehatan {page_id}</h1>{body}</main>"
+        "<footer>Hak cipta dilindungi</footer></body></html>"
+    ).encode("utf-8")
+
+
+@lru_cache(maxsize=8)
+def make_pdf(pages: int = 3, lines_per_page: int = 30) -> bytes:
+    objects: list[bytes] = [b"", b""]
+    page_refs = []
+    font_id = 3
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    words = _PARAGRAPH.split()
+    for p in range(pages):
+        lines = []
+        for i in range(lines_per_page):
+            start = (p * lines_per_page + i) * 7 % len(words)
+            lines.append(" ".join((words * 2)[start:start + 10]))
+        text = " ".join(f"({line}) '" for line in lines)
+        stream = f"BT /F1 9 Tf 40 760 Td 12 TL {text} ET".encode("latin-1", errors="ignore")
+
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (content_id, font_id)
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, obj)
+
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def make_image(seed: int, width: int = 640, height: int = 480, quality: int = 85) -> bytes:
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), (rng.randrange(120, 220),) * 3)
+    draw = ImageDraw.Draw(img)
+    for _ in range(10):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(width // 10, width // 3)
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class MockUpstreams:
+    def __init__(
+        self,
+        openai: UpstreamProfile | None = None,
+        cse: UpstreamProfile | None = None,
+        web: UpstreamProfile | None = None,
+        pdf_every: int = 4,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.openai = openai or UpstreamProfile()
+        self.cse = cse or UpstreamProfile()
+        self.web = web or UpstreamProfile()
+        self.pdf_every = pdf_every
+        self.counts: dict[str, int] = {"openai": 0, "cse": 0, "web": 0, "image": 0, "batch": 0, "doc_range_bytes": 0}
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict[str, str]:
+        return {
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "GOOGLE_SEARCH_ENDPOINT": f"{self.base_url}/cse",
+            "IMAGE_FETCH_ALLOW_PRIVATE": "1",
+        }
+
+    def start(self) -> "MockUpstreams":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[name] += n
+
+    def _handler(self):
+        upstreams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_ranged(self, body: bytes, content_type: str) -> None:
+                # Honors a single "bytes=start-end" range, like a static file server.
+                spec = (self.headers.get("Range") or "").removeprefix("bytes=")
+                start, _, end = spec.partition("-")
+                if not start.isdigit():
+                    self.send_response(200)
+                    self.send_header("Accept-Ranges", "bytes")
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    return self._write(body)
+                first = int(start)
+                last = min(len(body) - 1, int(end) if end.isdigit() else len(body) - 1)
+                part = body[first:last + 1]
+                upstreams._count("doc_range_bytes", len(part))
+                self.send_response(206)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Range", f"bytes {first}-{last}/{len(body)}")
+                self.send_header("Content-Length", str(len(part)))
+                self.end_headers()
+                self._write(part)
+
+            def _write(self, body: bytes) -> None:
+                # Clients stop reading large documents early; that is not an error here.
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def _fail(self) -> None:
+                self._send(503, b'{"error": {"message": "mock failure"}}')
+
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                if url.path == "/cse":
+                    upstreams._count("cse")
+                    upstreams.cse.wait()
+                    if upstreams.cse.should_fail():
+                        return self._fail()
+                    params = parse_qs(url.query)
+                    query = params.get("q", [""])[0]
+                    num = int(params.get("num", ["5"])[0])
+                    seed = abs(hash(query)) % 100000
+                    items = []
+                    for i in range(num):
+                        page = seed + i
+                        ext = "pdf" if upstreams.pdf_every and page % upstreams.pdf_every == 0 else "html"
+                        items.append({"link": f"{upstreams.base_url}/pages/{page}.{ext}", "title": f"Halaman {page}"})
+                    return self._send(200, json.dumps({"items": items}).encode("utf-8"))
+
+                if url.path.startswith("/pages/"):
+                    upstreams._count("web")
+                    upstreams.web.wait()
+                    if upstreams.web.should_fail():
+                        return self._fail()
+                    name = url.path.rsplit("/", 1)[-1]
+                    if name.endswith(".pdf"):
+                        return self._send(200, make_pdf(), "application/pdf")
+                    return self._send(200, make_html(name), "text/html; charset=utf-8")
+
+                if url.path.startswith("/docs/"):
+                    # /docs/{pages}.pdf: a large PDF that supports Range requests.
+                    upstreams._count("web")
+                    pages = int(url.path.rsplit("/", 1)[-1].split(".", 1)[0] or "3")
+                    return self._send_ranged(make_pdf(pages=pages), "application/pdf")
+
+                if url.path.startswith("/images/"):
+                    # Any query string (e.g. a signature) is ignored, like a signed storage URL.
+                    upstreams._count("image")
+                    upstreams.web.wait()
+                    name = url.path.rsplit("/", 1)[-1].split(".", 1)[0]
+                    seed = int("".join(c for c in name if c.isdigit()) or "0")
+                    return self._send(200, make_image(seed), "image/jpeg")
+
+                if url.path.startswith("/v1/batches/"):
+                    batch = upstreams.batches.get(url.path.rsplit("/", 1)[-1])
+                    if batch is None:
+                        return self._send(404, b"{}")
+                    return self._send(200, json.dumps(batch).encode("utf-8"))
+
+                if url.path.startswith("/v1/files/") and url.path.endswith("/content"):
+                    data = upstreams.files.get(url.path.split("/")[3])
+                    if data is None:
+                        return self._send(404, b"{}")
+                    return self._send(200, data, "application/octet-stream")
+
+                self._send(404, b"{}")
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                data = self.rfile.read(length)
+                if self.path.endswith("/files"):
+                    return self._upload(data)
+                if self.path.endswith("/batches"):
+                    return self._create_batch(json.loads(data or b"{}"))
+                if not self.path.endswith("/chat/completions"):
+                    return self._send(404, b"{}")
+                body = json.loads(data or b"{}")
+
+                upstreams._count("openai")
+                upstreams.openai.wait()
+                if upstreams.openai.should_fail():
+                    return self._fail()
+
+                text = self._completion_text(body)
+                if body.get("stream"):
+                    return self._stream(text)
+
+                payload = {
+                    "id": "mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {"prompt_tokens": 100, "completion_tokens": 40, "total_tokens": 140},
+                }
+                self._send(200, json.dumps(payload).encode("utf-8"))
+
+            def _upload(self, data: bytes) -> None:
+                # Only the file part of the multipart body matters.
+                boundary = self.headers.get("Content-Type", "").split("boundary=", 1)[-1].strip('"').encode()
+                content = b""
+                for part in data.split(b"--" + boundary):
+                    head, _, rest = part.partition(b"\r\n\r\n")
+                    if b'name="file"' in head:
+                        content = rest.rsplit(b"\r\n", 1)[0]
+                file_id = f"file-{len(upstreams.files) + 1}"
+                upstreams.files[file_id] = content
+                self._send(200, json.dumps({
+                    "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                    "filename": "batch.jsonl", "purpose": "batch", "status": "processed",
+                }).encode("utf-8"))
+
+            def _create_batch(self, body: dict) -> None:
+                # Batches complete immediately; every line runs through the chat mock.
+                upstreams._count("batch")
+                out = []
+                for line in upstreams.files.get(body.get("input_file_id"), b"").decode("utf-8").splitlines():
+                    if not line.strip():
+                        continue
+                    request = json.loads(line)
+                    completion = {
+                        "id": "mock",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request["body"].get("model", "mock"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": self._completion_text(request["body"])},
+                            "finish_reason": "stop",
+                        }],
+                    }
+                    out.append(json.dumps({
+                        "id": f"req-{len(out)}",
+                        "custom_id": request["custom_id"],
+                        "response": {"status_code": 200, "request_id": "mock", "body": completion},
+                        "error": None,
+                    }))
+                output_id = f"file-{len(upstreams.files) + 1}"
+                upstreams.files[output_id] = ("\n".join(out) + "\n").encode("utf-8")
+
+                batch_id = f"batch-{len(upstreams.batches) + 1}"
+                batch = {
+                    "id": batch_id,
+                    "object": "batch",
+                    "endpoint": body.get("endpoint"),
+                    "input_file_id": body.get("input_file_id"),
+                    "completion_window": body.get("completion_window"),
+                    "status": "completed",
+                    "output_file_id": output_id,
+                    "error_file_id": None,
+                    "created_at": int(time.time()),
+                    "request_counts": {"total": len(out), "completed": len(out), "failed": 0},
+                }
+                upstreams.batches[batch_id] = batch
+                self._send(200, json.dumps(batch).encode("utf-8"))
+
+            def _completion_text(self, body: dict) -> str:
+                messages = body.get("messages") or []
+                if any(isinstance(m.get("content"), list) for m in messages):
+                    return json.dumps(_FOOD_JSON)
+
+                prompt = " ".join(m.get("content") or "" for m in messages)
+                if "personal_ai_insight" in prompt:
+                    return json.dumps(_INSIGHT_JSON)
+                if '"queries"' in prompt:
+                    words = [w for w in prompt.split() if w.isalpha()][-6:]
+                    return json.dumps({"queries": [" ".join(words), "gizi " + " ".join(words[:3])]})
+                return "Telur aman dikonsumsi setiap hari dalam jumlah wajar. " * 4
+
+            def _stream(self, text: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for word in text.split(" "):
+                    chunk = {
+                        "id": "mock",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": "mock",
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                    }
+                    self._chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self._chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, data: bytes) -> None:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+        return Handler
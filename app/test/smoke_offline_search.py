@@ -5,25 +5,48 @@ This module is intentionally executable as a script and avoids network calls.
 
 from __future__ import annotations
 
+import asyncio
+
 
 def main() -> None:
     from app.services.search import search_service
 
     # Monkeypatch search to avoid network.
-    search_service.google_search = lambda q: [
-        "https://example.com/a",
-        "https://example.com/a",  # dup
-        "https://example.com/b",
-    ]
+    async def fake_google_search(q):
+        return [
+            "https://example.com/a",
+            "https://example.com/a",  # dup
+            "https://example.com/b",
+        ]
 
     # Monkeypatch extractor to avoid network.
-    search_service.extract_web_content = lambda url: ("x" * 400) + " " + url
-    search_service._get_cached_or_extract = lambda url: search_service.extract_web_content(url)
+    async def fake_extract(url):
+        return ("x" * 400) + " " + url
+
+    search_service.google_search = fake_google_search
+    search_service.extract_web_content = fake_extract
+    search_service._get_cached_or_extract = fake_extract
 
-    res = search_service.search_and_extract("dummy query")
+    res = asyncio.run(search_service.search_and_extract("dummy query"))
     assert res["results"], "no results"
     assert len({r["url"] for r in res["results"]}) == len(res["results"]), "duplicate URLs in results"
 
+    from app.services.search.passages import select_passages
+
+    filler = "Berita ekonomi nasional hari ini. " * 200
+    answer = "Satu butir telur rebus mengandung sekitar 77 kalori."
+    selected = select_passages("kalori telur rebus", filler + answer + " " + filler, 600)
+    assert "77 kalori" in selected.split("\n")[0], "relevant passage not ranked first"
+    assert len(selected) <= 600, "passages exceed budget"
+
+    from app.services.search.dedup import NearDuplicateIndex
+
+    index = NearDuplicateIndex()
+    article = " ".join(f"kalimat {i} tentang gizi anak dan protein hewani." for i in range(80))
+    assert index.add("https://a.example/x", article) == "https://a.example/x"
+    assert index.add("https://b.example/y", "Baca juga: " + article + " Editor: Budi") == "https://a.example/x", "syndicated copy not detected"
+    assert index.add("https://c.example/z", filler) == "https://c.example/z", "unrelated page marked duplicate"
+
     print("OK")
 
 
@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
+import asyncio
+
 
 def main() -> None:
     from app.services.search.extractor import extract_web_content
 
     url = "https://kemkes.go.id/app_asset/file_content_download/172231123666a86244b83fd8.51637104.pdf"
-    text = extract_web_content(url)
+    text = asyncio.run(extract_web_content(url))
     print(text[:1200])
     print("\n---\nlen=", len(text))
 
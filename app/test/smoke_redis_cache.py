@@ -0,0 +1,99 @@
+"""Offline smoke test: TTLCache with the Redis tier, against fakeredis.
+
+    pip install fakeredis
+    python -m app.test.smoke_redis_cache
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+
+def _wait_for(check, timeout_s: float = 2.0) -> None:
+    # Remote writes go through a writer thread.
+    deadline = time.monotonic() + timeout_s
+    while not check():
+        assert time.monotonic() < deadline, "remote write never landed"
+        time.sleep(0.01)
+
+
+class _FlakyClient:
+    def __init__(self, client):
+        self.client = client
+        self.down = False
+        self.calls = 0
+
+    def mget(self, keys):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("redis down")
+        return self.client.mget(keys)
+
+    def set(self, key, value, px=None):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("redis down")
+        return self.client.set(key, value, px=px)
+
+
+async def _run() -> None:
+    import fakeredis
+
+    from app.services.search.cache import RedisBackend, TTLCache
+
+    server = fakeredis.FakeServer()
+
+    def cache(namespace: str, client=None, open_s: float = 5.0) -> TTLCache:
+        client = client if client is not None else fakeredis.FakeRedis(server=server)
+        return TTLCache(ttl=60, namespace=namespace, remote=RedisBackend(namespace, client=client, open_s=open_s))
+
+    raw = fakeredis.FakeRedis(server=server)
+
+    # Round trip: a fresh process (empty memory tier) reads what another one wrote.
+    writer = cache("smoke")
+    writer.set("small", {"answer": "telur", "n": 2})
+    _wait_for(lambda: raw.exists("dinacom:smoke:small"))
+    reader = cache("smoke")
+    assert reader.get("small") == {"answer": "telur", "n": 2}
+    assert await cache("smoke").aget("small") == {"answer": "telur", "n": 2}
+
+    # Large values are zlib-compressed on the wire.
+    big = {"text": "Telur merupakan sumber protein hewani. " * 200}
+    writer.set("big", big)
+    _wait_for(lambda: raw.exists("dinacom:smoke:big"))
+    stored = raw.get("dinacom:smoke:big")
+    assert stored[:1] == b"z" and len(stored) < len(str(big)), "large value not compressed"
+    assert await cache("smoke").aget("big") == big
+
+    # One MGET for the keys missing locally; partial hits fill the memory tier.
+    reader = cache("smoke")
+    values = await reader.aget_many(["small", "absent", "big"])
+    assert values == [{"answer": "telur", "n": 2}, None, big]
+    stats = reader.stats()
+    assert (stats["remote_hits"], stats["remote_misses"]) == (2, 1), stats
+    assert reader.get("small") == {"answer": "telur", "n": 2} and reader.stats()["remote_hits"] == 2
+
+    # An error opens the circuit: Redis is skipped and the memory tier keeps working.
+    flaky = _FlakyClient(fakeredis.FakeRedis(server=server))
+    degraded = cache("smoke", client=flaky, open_s=0.2)
+    flaky.down = True
+    assert await degraded.aget("small") is None
+    assert degraded.stats()["remote_errors"] == 1 and flaky.calls == 1
+    assert await degraded.aget("small") is None and flaky.calls == 1, "open circuit still called Redis"
+    degraded.set("local", "still cached")
+    assert degraded.get("local") == "still cached" and flaky.calls == 1
+
+    # After the open period Redis is tried again.
+    flaky.down = False
+    await asyncio.sleep(0.25)
+    assert await degraded.aget("small") == {"answer": "telur", "n": 2} and flaky.calls == 2
+
+
+def main() -> None:
+    asyncio.run(_run())
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Offline smoke test: the semantic cache must not answer a different question.
+
+    python -m app.test.smoke_semantic_cache
+"""
+
+from __future__ import annotations
+
+
+# Pairs that look alike but ask different things; a hit would return a wrong answer.
+_DIFFERENT = [
+    ("apakah ibu hamil boleh minum kopi", "apakah ibu hamil tidak boleh minum kopi"),
+    ("apakah ibu hamil boleh minum kopi", "ibu hamil gak boleh minum kopi"),
+    ("dosis paracetamol anak 5 tahun", "dosis paracetamol anak 1 tahun"),
+    ("dosis paracetamol anak 5 tahun", "dosis paracetamol anak 15 tahun"),
+    ("makan telur", "makan telur mentah"),
+    ("berapa kalori telur rebus", "berapa kalori telur goreng"),
+]
+
+# Rephrasings of the same question.
+_SAME = [
+    ("Apakah ibu hamil boleh minum kopi?", "ibu hamil boleh minum kopi ya"),
+    ("berapa kalori telur rebus", "brp kalori telur rebus sih"),
+    ("telur tiap hari aman?", "aman ga makan telur setiap hari"),
+    ("telur tiap hari aman?", "makan telur tiap hari aman?"),
+    ("telur tiap hari aman?", "telur tiap hari aman ga?"),
+]
+
+
+def main() -> None:
+    from app.ai.semantic_cache import SemanticCache
+
+    for cached, asked in _DIFFERENT:
+        cache = SemanticCache()
+        cache.set(cached, "answer")
+        assert cache.get(asked) is None, f"{asked!r} answered from {cached!r}"
+
+    for cached, asked in _SAME:
+        cache = SemanticCache()
+        cache.set(cached, "answer")
+        assert cache.get(asked) == "answer", f"{asked!r} missed {cached!r}"
+
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
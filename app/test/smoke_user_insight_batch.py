@@ -0,0 +1,60 @@
+"""Offline smoke test for bulk user-insight: direct mode and the Batch API workflow.
+
+Runs against the local mock upstreams; no network calls.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+
+
+def _payload(i: int) -> dict:
+    return {
+        "user": {"id": str(i), "name": f"user {i}", "age": 30, "gender": "female"},
+        "daily_nutrition_summary": {"calories_kcal": 1800 + i, "vitamins": ["Vitamin C"]},
+    }
+
+
+def main() -> None:
+    from app.test.mock_upstreams import MockUpstreams
+
+    upstreams = MockUpstreams().start()
+    os.environ.update(upstreams.env())
+    os.environ["ORCH_USER_INSIGHT_CACHE_TTL_S"] = "0"
+
+    from app.jobs import user_insight_batch
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "users.jsonl")
+            with open(src, "w", encoding="utf-8") as f:
+                # Two duplicates of user 0 share one request.
+                for i in [0, 1, 2, 0, 3, 0]:
+                    f.write(json.dumps(_payload(i)) + "\n")
+
+            for mode in ("direct", "batch"):
+                before = dict(upstreams.counts)
+                dst = os.path.join(tmp, f"out-{mode}.jsonl")
+                user_insight_batch.main(["--input", src, "--output", dst, "--mode", mode, "--poll-interval-s", "0.01"])
+
+                with open(dst, "r", encoding="utf-8") as f:
+                    rows = [json.loads(line) for line in f]
+                assert [r["user_id"] for r in rows] == ["0", "1", "2", "0", "3", "0"], rows
+                assert all("response" in r and 0 <= r["response"]["health_score"] <= 100 for r in rows), rows
+                assert [r["index"] for r in rows] == list(range(6)), rows
+
+                if mode == "direct":
+                    assert upstreams.counts["openai"] - before["openai"] == 4, upstreams.counts
+                else:
+                    assert upstreams.counts["batch"] - before["batch"] == 1, upstreams.counts
+                    assert upstreams.counts["openai"] == before["openai"], upstreams.counts
+    finally:
+        upstreams.stop()
+
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from app.ai.decision import DecisionService
+import asyncio
 import time
 
 
@@ -9,7 +10,7 @@ def main() -> None:
 	decision = DecisionService()
 	test = "Kalau misal gua makan telur tiap hari aman ga si?"
 	start_time = time.time()
-	result = decision.run(test, user_history="")
+	result = asyncio.run(decision.run(test, user_history=""))
 	end_time = time.time()
 	elapsed_time = (end_time - start_time) * 1000
 	print("\nUSER:", test)
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 
@@ -7,8 +8,10 @@ from app.services.search.extractor import extract_web_content
 
 
 def main() -> None:
-	response = extract_web_content(
-		"https://www.kompas.id/artikel/pengamen-dan-sisi-lain-pertumbuhan-kota?open_from=Artikel_Opini_Page"
+	response = asyncio.run(
+		extract_web_content(
+			"https://www.kompas.id/artikel/pengamen-dan-sisi-lain-pertumbuhan-kota?open_from=Artikel_Opini_Page"
+		)
 	)
 	print(response)
 
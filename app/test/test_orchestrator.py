@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 
@@ -8,7 +9,7 @@ from app.ai.orchestrator import Orchestrator
 
 def main() -> None:
 	orch = Orchestrator()
-	response = orch.handle_chat("sakit pinggang solusi nya apa ya")
+	response = asyncio.run(orch.handle_chat("sakit pinggang solusi nya apa ya"))
 	print(response)
 
 
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 
@@ -7,7 +8,7 @@ from app.services.search.search_service import search_and_extract
 
 
 def main() -> None:
-	response = search_and_extract("Gejala Batuk apa aja si?")
+	response = asyncio.run(search_and_extract("Gejala Batuk apa aja si?"))
 	print(response)
 
 